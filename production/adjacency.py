@@ -0,0 +1,97 @@
+'''
+    Compressed sparse row (CSR) adjacency of a frame.
+
+    The successors of the point with index i are
+        indices[indptr[i]:indptr[i+1]]
+    so the whole relation is stored in two integer arrays. A CSRGraph is built
+    once per frame and reused for every reachability query on it; the
+    breadth-first search works on whole frontiers with NumPy and marks points
+    in a visited bitmap, so no point is ever enqueued twice.
+'''
+import numpy as np
+
+
+'''
+    Builds the compressed sparse row adjacency of a relation on Xn
+
+    Input:
+        n: number of points
+        src, dst: arrays with the pairs (src[k], dst[k]) of the relation
+    Output:
+        indptr, indices: the successors of x are indices[indptr[x]:indptr[x+1]]
+'''
+def csr_arrays(n, src, dst):
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order]
+
+
+'''
+    Defines the CSR adjacency of a frame
+
+    Input:
+        points: array of worlds
+        R: set of (x,y) pairs representing relation from x to y
+
+    Output: Creates a CSRGraph object. Points are numbered 0, 1, ... in the
+    order they are given; graph.points[i] is the point with index i and
+    graph.index[x] is the index of the point x.
+
+'''
+class CSRGraph:
+    def __init__(self, points, R):
+        self.points = list(points)
+        self.n = len(self.points)
+        self.index = {x: i for i, x in enumerate(self.points)}
+        pairs = np.array([(self.index[x], self.index[y]) for (x, y) in R], dtype=np.int64).reshape(-1, 2)
+        self.indptr, self.indices = csr_arrays(self.n, pairs[:, 0], pairs[:, 1])
+
+    def __repr__(self):
+        return f"CSRGraph(n={self.n}, edges={len(self.indices)})"
+
+    '''
+        Returns the indices of the successors of the point with index i
+    '''
+    def __getitem__(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    '''
+        Returns the (source, target) index arrays of all edges
+    '''
+    def edges(self):
+        return np.repeat(np.arange(self.n), np.diff(self.indptr)), self.indices
+
+    '''
+        Returns the indices of all points reachable from the given indices
+        (including the starting points themselves) in increasing order
+    '''
+    def reachable_indices(self, start):
+        indptr = self.indptr
+        visited = np.zeros(self.n, dtype=bool)
+        frontier = np.unique(np.asarray(start, dtype=np.int64).reshape(-1))
+        visited[frontier] = True
+
+        while len(frontier) > 0:
+            # gather the successor lists of the whole frontier at once
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.arange(total) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            successors = self.indices[offsets]
+
+            frontier = np.unique(successors[~visited[successors]])
+            visited[frontier] = True
+
+        return np.flatnonzero(visited)
+
+    '''
+        Returns the set of points reachable from the point start
+    '''
+    def reachable(self, start):
+        points = self.points
+        return {points[i] for i in self.reachable_indices(self.index[start]).tolist()}
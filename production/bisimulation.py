@@ -0,0 +1,154 @@
+'''
+    Largest bisimulation of a frame by Paige–Tarjan partition refinement.
+
+    A partition of the points is stable when, for every two blocks B and C,
+    either every point of B has a successor in C or no point of B does. The
+    coarsest stable partition is the largest bisimulation of the frame, and
+    the quotient by it is the smallest p-morphic image of the frame: the
+    map sending every point to its block is a p-morphism.
+
+    The algorithm keeps a coarse partition X of compound blocks, each a
+    union of blocks of the fine partition Q, with Q stable with respect to
+    every compound block. A compound block S made of several blocks is cut
+    into a block B of Q, the smaller of two, and S - B, and Q is split with
+    respect to both. Points are only scanned through the predecessors of
+    the smaller part B, and the number of successors of every point in S is
+    kept, so the split with respect to S - B needs no scan of S - B. Every
+    point is in the smaller part O(log n) times, giving O(|R| log n).
+'''
+
+
+'''
+    Computes the coarsest stable partition of a relation on Xn
+
+    Input:
+        n: number of points
+        succ: successor lists of the points 0, 1, ..., n-1
+    Output:
+        list labelling every point with its block; blocks are numbered
+        0, 1, ... in the order of their smallest point
+'''
+def coarsest_stable_partition(n, succ):
+    # predecessor edges of every point, as (source, edge number)
+    pred = [[] for _ in range(n)]
+    num_edges = 0
+    for x in range(n):
+        for y in succ[x]:
+            pred[y].append((x, num_edges))
+            num_edges += 1
+
+    # counter[e] is the record [count] shared by the edges from x into the
+    # compound block containing the target of e: the number of such edges
+    counter = [None] * num_edges
+    e = 0
+    for x in range(n):
+        record = [len(succ[x])]
+        for y in succ[x]:
+            counter[e] = record
+            e += 1
+
+    # fine blocks, and compound blocks as lists of fine blocks, where
+    # position[b] is the position of b in the list of its compound block
+    block = [0] * n
+    members = [set(range(n))]
+    compound = [0]
+    position = [0]
+    parts = [[0]]
+    pending = []
+
+    '''
+        Moves the marked points of every block into a new block
+    '''
+    def split(marked):
+        touched = {}
+        for x in marked:
+            touched.setdefault(block[x], []).append(x)
+        for b, points in touched.items():
+            if len(points) == len(members[b]):
+                continue
+            new = len(members)
+            members.append(set(points))
+            members[b].difference_update(points)
+            for x in points:
+                block[x] = new
+            c = compound[b]
+            compound.append(c)
+            position.append(len(parts[c]))
+            parts[c].append(new)
+            if len(parts[c]) == 2:
+                pending.append(c)
+
+    # stability with respect to the whole set: points with successors
+    if n > 0:
+        split([x for x in range(n) if succ[x]])
+
+    while pending:
+        S = pending.pop()
+        if len(parts[S]) < 2:
+            continue
+        first, second = parts[S][-1], parts[S][-2]
+        B = first if len(members[first]) <= len(members[second]) else second
+        # remove B by moving the last block of S into its place
+        last = parts[S].pop()
+        if last != B:
+            parts[S][position[B]] = last
+            position[last] = position[B]
+        if len(parts[S]) >= 2:
+            pending.append(S)
+        compound[B] = len(parts)
+        position[B] = 0
+        parts.append([B])
+
+        # number of successors in B of every predecessor of B
+        in_B = {}
+        edges_B = []
+        for y in members[B]:
+            for x, e in pred[y]:
+                in_B[x] = in_B.get(x, 0) + 1
+                edges_B.append((x, e))
+
+        # split with respect to B, then with respect to S - B: a predecessor of
+        # B has a successor in S - B iff it has more successors in S than in B
+        split(list(in_B))
+        split({x for x, e in edges_B if counter[e][0] == in_B[x]})
+
+        # the edges into B now count successors in B instead of in S
+        records = {}
+        for x, e in edges_B:
+            counter[e][0] -= 1
+            if x not in records:
+                records[x] = [in_B[x]]
+            counter[e] = records[x]
+
+    # number blocks in the order of their smallest point
+    names = {}
+    labels = []
+    for x in range(n):
+        labels.append(names.setdefault(block[x], len(names)))
+    return labels
+
+
+'''
+    Computes the quotient of a frame by its largest bisimulation
+
+    Input:
+        points: array of worlds
+        R: set of (x,y) pairs representing relation from x to y
+    Output:
+        I. points of the quotient, 0, 1, ..., k-1
+        II. relation of the quotient, where [a] R [b] iff a' R b' for some
+        a' ∼ a and b' ∼ b
+        III. dictionary mapping every point to its block, a p-morphism onto
+        the quotient
+'''
+def bisimulation_quotient(points, R):
+    points = list(points)
+    index = {x: i for i, x in enumerate(points)}
+    succ = [[] for _ in points]
+    for (x, y) in R:
+        succ[index[x]].append(index[y])
+    labels = coarsest_stable_partition(len(points), succ)
+
+    projection = {x: labels[i] for i, x in enumerate(points)}
+    relation = {(projection[x], projection[y]) for (x, y) in R}
+    return list(range(len(set(labels)))), relation, projection
@@ -0,0 +1,317 @@
+'''
+    Bit-packed binary relations on Xn = {0, 1, ..., n-1}.
+
+    Row i of a relation R is stored as a bit vector of ceil(n/64) uint64 words,
+    where bit j of row i is set iff (i, j) ∈ R. Compared with a float64 0-1
+    matrix this needs 64 times less memory, and whole rows can be combined
+    with a single word-level OR.
+
+    Conversions to and from sets of (x,y) pairs are vectorized with NumPy and
+    are done in blocks of rows, so the full n x n matrix is never unpacked.
+'''
+import numpy as np
+
+
+WORD_BITS = 64
+
+# number of cells unpacked at once when converting rows back to pairs
+BLOCK_CELLS = 1 << 24
+
+# side of the square blocks multiplied at once by product()
+TILE = 1024
+
+# number of set bits in each byte value
+POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+'''
+    Number of uint64 words needed to store a row of n bits
+'''
+def num_words(n):
+    return (n + WORD_BITS - 1) // WORD_BITS
+
+
+'''
+    Returns the words holding the given bits and the single-bit mask of each bit
+
+    Input:
+        j: integer or array of bit positions
+    Output:
+        (word index, uint64 mask) for every position in j
+'''
+def bit_position(j):
+    j = np.asarray(j, dtype=np.int64)
+    return j >> 6, np.left_shift(np.uint64(1), (j & 63).astype(np.uint64))
+
+
+'''
+    Packs a 0-1 matrix with n columns into uint64 words (bit j of a row = column j)
+'''
+def pack_rows(M, n):
+    M = np.asarray(M, dtype=bool)
+    words = num_words(n)
+    padded = np.zeros((M.shape[0], words * WORD_BITS), dtype=bool)
+    padded[:, :M.shape[1]] = M
+    packed = np.packbits(padded, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+
+'''
+    Unpacks uint64 rows into a boolean matrix with n columns
+'''
+def unpack_rows(rows, n):
+    rows = np.ascontiguousarray(rows, dtype='<u8')
+    bits = np.unpackbits(rows.view(np.uint8), axis=1, bitorder='little')
+    return bits[:, :n].astype(bool)
+
+
+'''
+    Defines a bit-packed relation
+
+    Input:
+        n: number of points, the relation is on Xn = {0, 1, ..., n-1}
+        rows: optional (n, ceil(n/64)) uint64 array of packed rows
+
+    Output: Creates a BitRelation object
+
+'''
+class BitRelation:
+    def __init__(self, n, rows=None):
+        self.n = n
+        self.words = num_words(n)
+        if rows is None:
+            rows = np.zeros((n, self.words), dtype=np.uint64)
+        self.rows = rows
+
+    def __repr__(self):
+        return f"BitRelation(n={self.n}, pairs={self.count()})"
+
+    def __eq__(self, other):
+        return isinstance(other, BitRelation) and self.n == other.n \
+            and np.array_equal(self.rows, other.rows)
+
+    def __or__(self, other):
+        return BitRelation(self.n, self.rows | other.rows)
+
+    def __contains__(self, pair):
+        i, j = pair
+        word, mask = bit_position(j)
+        return bool(self.rows[i, word] & mask)
+
+    '''
+        Create the BitRelation of a set of (x,y) pairs on Xn
+    '''
+    @classmethod
+    def from_relation(cls, n, R):
+        relation = cls(n)
+        if len(R) > 0:
+            pairs = np.array(list(R), dtype=np.int64).reshape(-1, 2)
+            relation.add_pairs(pairs[:, 0], pairs[:, 1])
+        return relation
+
+    '''
+        Create the BitRelation of a 0-1 matrix
+    '''
+    @classmethod
+    def from_matrix(cls, M):
+        n = len(M)
+        return cls(n, pack_rows(M, n))
+
+    def copy(self):
+        return BitRelation(self.n, self.rows.copy())
+
+    '''
+        Adds the pairs (src[k], dst[k]) to the relation
+    '''
+    def add_pairs(self, src, dst):
+        word, mask = bit_position(dst)
+        np.bitwise_or.at(self.rows, (np.asarray(src, dtype=np.int64), word), mask)
+
+    '''
+        Adds (i,i) for all i in Xn
+    '''
+    def add_diagonal(self):
+        diagonal = np.arange(self.n)
+        self.add_pairs(diagonal, diagonal)
+
+    '''
+        Returns a boolean array telling which points x satisfy x R k
+    '''
+    def column(self, k):
+        word, mask = bit_position(k)
+        return (self.rows[:, word] & mask) != 0
+
+    '''
+        Returns the 0-1 matrix of rows start, ..., stop-1
+    '''
+    def to_matrix(self, start=0, stop=None):
+        return unpack_rows(self.rows[start:stop], self.n)
+
+    '''
+        Returns the inverse relation R^-1 = {(y,x) | (x,y) ∈ R}
+
+        Each block of 64*k rows is unpacked, transposed and packed into
+        k words of every row of the result.
+    '''
+    def transpose(self):
+        result = BitRelation(self.n)
+        block = max(1, BLOCK_CELLS // max(1, self.n * WORD_BITS)) * WORD_BITS
+        for start in range(0, self.n, block):
+            stop = min(start + block, self.n)
+            packed = pack_rows(self.to_matrix(start, stop).T, stop - start)
+            first = start // WORD_BITS
+            result.rows[:, first:first + packed.shape[1]] = packed
+        return result
+
+    '''
+        Yields the pairs of the relation as two arrays (sources, targets),
+        one block of rows at a time
+    '''
+    def iter_pairs(self):
+        block = max(1, BLOCK_CELLS // max(1, self.n))
+        for start in range(0, self.n, block):
+            src, dst = np.nonzero(self.to_matrix(start, start + block))
+            yield src + start, dst
+
+    '''
+        Returns all pairs of the relation as two arrays (sources, targets)
+    '''
+    def pairs(self):
+        blocks = list(self.iter_pairs())
+        if not blocks:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
+
+    '''
+        Returns the relation as a set of (x,y) pairs
+    '''
+    def to_relation(self):
+        R = set()
+        for src, dst in self.iter_pairs():
+            R.update(zip(src.tolist(), dst.tolist()))
+        return R
+
+    '''
+        Number of pairs in the relation
+    '''
+    def count(self):
+        return int(POPCOUNT8[np.ascontiguousarray(self.rows, dtype='<u8').view(np.uint8)].sum(dtype=np.int64))
+
+    '''
+        Returns the composition {(x,z) | x R y and y S z for some y},
+        where R is this relation and S is other.
+
+        The product is computed tile by tile: a tile x tile block of the result
+        is the sum of products of unpacked float32 blocks of R and S, which
+        is clipped back to {0,1} and packed. Only three tiles are unpacked at
+        a time, so large relations are processed in pieces that fit in cache
+        and RAM. Counts never exceed the tile size, so float32 is exact.
+    '''
+    def product(self, other, tile=TILE):
+        n = self.n
+        result = BitRelation(n)
+        tile = max(WORD_BITS, tile - tile % WORD_BITS)
+        step = tile // WORD_BITS
+        for i in range(0, n, tile):
+            row_block = self.rows[i:i + tile]
+            for k in range(0, n, tile):
+                words_k = row_block[:, k // WORD_BITS:k // WORD_BITS + step]
+                if not words_k.any():
+                    continue
+                A = unpack_rows(words_k, min(tile, n - k)).astype(np.float32)
+                for j in range(0, n, tile):
+                    B = unpack_rows(other.rows[k:k + tile, j // WORD_BITS:j // WORD_BITS + step],
+                                    min(tile, n - j)).astype(np.float32)
+                    C = np.dot(A, B) > 0
+                    result.rows[i:i + tile, j // WORD_BITS:j // WORD_BITS + step] |= pack_rows(C, C.shape[1])
+        return result
+
+    '''
+        Returns the composition of this relation R with other relation S
+        using the Method of Four Russians on packed rows.
+
+        The columns of R are split into chunks of 8. For a chunk, a table of
+        all 256 ORs of the corresponding 8 rows of S is built with 255 row
+        ORs; then every row x of the result is ORed with the table entry
+        indexed by the byte of row x of R in that chunk. This needs about
+        n^3/512 word operations and no unpacked matrices.
+    '''
+    def compose(self, other):
+        n = self.n
+        result = BitRelation(n)
+        R_bytes = np.ascontiguousarray(self.rows, dtype='<u8').view(np.uint8)
+        S_rows = other.rows
+        table = np.zeros((256, other.words), dtype=np.uint64)
+        batch = max(1, BLOCK_CELLS // max(1, other.words * WORD_BITS))
+
+        for chunk in range(0, (n + 7) // 8):
+            chunk_bytes = R_bytes[:, chunk]
+            hit = np.flatnonzero(chunk_bytes)
+            if len(hit) == 0:
+                continue
+
+            # table[b] = OR of the rows 8*chunk + t of S for the bits t set in b
+            first = 8 * chunk
+            for t in range(min(8, n - first)):
+                table[1 << t:2 << t] = table[:1 << t] | S_rows[first + t]
+
+            for start in range(0, len(hit), batch):
+                rows = hit[start:start + batch]
+                result.rows[rows] |= table[chunk_bytes[rows]]
+        return result
+
+    '''
+        Returns the transitive closure as R U R^2 U R^4 U ...
+
+        Every step replaces M by M U M.M on boolean values, and stops
+        as soon as a step adds no new pairs.
+
+        Input:
+            kernel: "russians" to multiply with compose(), or "blas"
+            for the tiled float32 product()
+    '''
+    def squaring_closure(self, kernel="russians"):
+        if kernel == "russians":
+            multiply = BitRelation.compose
+        elif kernel == "blas":
+            multiply = BitRelation.product
+        else:
+            raise ValueError(f"Unknown boolean product kernel {kernel}")
+
+        closure = self
+        a = 1
+        while a < self.n:
+            a *= 2
+            step = closure | multiply(closure, closure)
+            if step == closure:
+                break
+            closure = step
+        return closure.copy() if closure is self else closure
+
+    '''
+        Returns the transitive closure using Warshall's algorithm on packed rows.
+
+        For each intermediate point k, every row i with i R k is ORed with
+        row k in one vectorized operation, which needs n^3/64 word operations.
+    '''
+    def warshall_closure(self):
+        closure = self.copy()
+        rows = closure.rows
+        for k in range(self.n):
+            through_k = closure.column(k)
+            if through_k.any():
+                rows[through_k] |= rows[k]
+        return closure
+
+
+'''
+    Composition of relations on Xn
+
+    Input:
+        R, S: BitRelations on Xn
+    Output:
+        the BitRelation {(x,z) | x R y and y S z for some y}
+'''
+def compose(R, S):
+    return R.compose(S)
@@ -0,0 +1,407 @@
+'''
+    Symmetries of finite frames.
+
+    A frame on the points 0, 1, ..., n-1 is given by the successor and
+    predecessor lists of its points. Colour refinement splits the colour
+    classes by the number of successors and predecessors their points have
+    in a splitting class, until no class splits any more. The classes are
+    kept in order, as in nauty, so isomorphic frames get the same colours.
+
+    Points of different colours are never swapped by an automorphism. Points
+    of the same colour are compared by individualization: both are given a
+    new colour, the colouring is refined again, and the search branches on
+    the first colour class that is still not a single point. The same
+    search, keeping the leaf with the smallest relabelled relation, gives a
+    canonical form: two frames are isomorphic exactly when their canonical
+    forms are equal.
+'''
+
+
+'''
+    Returns the successor and predecessor lists of a frame, where points
+    are replaced by their positions in points
+'''
+def adjacency_lists(points, R):
+    index = {x: i for i, x in enumerate(points)}
+    succ = [[] for _ in points]
+    pred = [[] for _ in points]
+    for (x, y) in R:
+        succ[index[x]].append(index[y])
+        pred[index[y]].append(index[x])
+    return succ, pred
+
+
+'''
+    Colour refinement
+
+    The colour classes are kept as consecutive cells of an ordering of the
+    points, and the colour of a point is the position of the first point of
+    its cell. A queue holds the cells the colouring may not yet be stable
+    with respect to. Splitting by a cell W only scans the edges at W, and
+    sorts the points it reaches by their numbers of successors and
+    predecessors in W; the points not reached stay first in their cell.
+    When a cell that is not in the queue splits, all parts but the largest
+    are queued, since the colouring stays stable with respect to the whole
+    cell.
+
+    Input:
+        colours: list giving an integer colour to every point
+        succ, pred: successor and predecessor lists
+        active: if given, points whose colour classes may be unstable; the
+        colouring must be stable with respect to all other classes
+    Output:
+        the coarsest stable refinement of colours, where the colour of a
+        point is the number of points in smaller colour classes, so the
+        order of the original colour classes is kept
+'''
+def refine(colours, succ, pred, active=None):
+    n = len(colours)
+    order = sorted(range(n), key=colours.__getitem__)
+    position = [0] * n
+    cell = [0] * n
+    end = {}
+    start = 0
+    for i in range(n):
+        v = order[i]
+        position[v] = i
+        if i > 0 and colours[v] != colours[order[i - 1]]:
+            end[start] = i
+            start = i
+        cell[v] = start
+    if n > 0:
+        end[start] = n
+
+    if active is None:
+        queue = sorted(end)
+    else:
+        queue = sorted({cell[v] for v in active})
+    pending = set(queue)
+    head = 0
+
+    while head < len(queue) and len(end) < n:
+        splitter = queue[head]
+        head += 1
+        pending.discard(splitter)
+
+        # numbers of successors and predecessors in the splitter
+        out_count = {}
+        in_count = {}
+        for w in order[splitter:end[splitter]]:
+            for v in pred[w]:
+                out_count[v] = out_count.get(v, 0) + 1
+            for v in succ[w]:
+                in_count[v] = in_count.get(v, 0) + 1
+
+        touched = {}
+        for v in out_count.keys() | in_count.keys():
+            count = (out_count.get(v, 0), in_count.get(v, 0))
+            touched.setdefault(cell[v], []).append((count, v))
+
+        for start in sorted(touched):
+            stop = end[start]
+            members = touched[start]
+            members.sort()
+            if len(members) == stop - start and members[0][0] == members[-1][0]:
+                continue
+
+            # move the touched points to the end of the cell, sorted
+            boundary = stop - len(members)
+            for j, (count, v) in enumerate(members):
+                i = boundary + j
+                u = order[i]
+                if u != v:
+                    order[position[v]] = u
+                    position[u] = position[v]
+                    order[i] = v
+                    position[v] = i
+            # cells: the untouched points, then one per count
+            parts = [start] if boundary > start else []
+            for j, (count, v) in enumerate(members):
+                if j == 0 or count != members[j - 1][0]:
+                    parts.append(boundary + j)
+            parts.append(stop)
+            # the first part keeps the start of the cell
+            end[start] = parts[1]
+            for a, b in zip(parts[1:], parts[2:]):
+                end[a] = b
+                for i in range(a, b):
+                    cell[order[i]] = a
+
+            sizes = [(b - a, -a) for a, b in zip(parts, parts[1:])]
+            largest = -max(sizes)[1]
+            for a in parts[:-1]:
+                if a in pending or (a == largest and start not in pending):
+                    continue
+                pending.add(a)
+                queue.append(a)
+
+    return cell
+
+
+'''
+    Gives the points in points new colours, larger than all other colours,
+    in the given order
+'''
+def individualize(colours, points):
+    colours = list(colours)
+    fresh = max(colours, default=-1) + 1
+    for j, v in enumerate(points):
+        colours[v] = fresh + j
+    return colours
+
+
+'''
+    Defines the automorphisms of a frame
+
+    Input:
+        succ, pred: successor and predecessor lists of the frame
+
+    Output: Creates an Automorphisms object. orbits(fixed) gives the orbits
+    of the automorphisms fixing every point of fixed, and is cached for
+    every set fixed.
+
+'''
+class Automorphisms:
+    def __init__(self, succ, pred):
+        self.n = n = len(succ)
+        self.succ_lists = succ
+        self.pred_lists = pred
+        self.succ = [set(s) for s in succ]
+        # two copies of the frame, points v and n + v
+        self.pair_succ = [list(s) for s in succ] + [[w + n for w in s] for s in succ]
+        self.pair_pred = [list(p) for p in pred] + [[w + n for w in p] for p in pred]
+        self.colours = refine([0] * n, succ, pred)
+        self.cache = {}
+
+    def __repr__(self):
+        return f"Automorphisms(n={self.n}, cached={len(self.cache)})"
+
+    '''
+        Returns a list labelling every point with the smallest point of its
+        orbit under the automorphisms fixing every point of fixed
+    '''
+    def orbits(self, fixed=()):
+        key = frozenset(fixed)
+        if key not in self.cache:
+            self.cache[key] = self.compute_orbits(sorted(key))
+        return self.cache[key]
+
+    def compute_orbits(self, fixed):
+        n = self.n
+        colours = refine(individualize(self.colours, fixed), self.succ_lists, self.pred_lists, fixed)
+        parent = list(range(n))
+
+        def find(v):
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        for v in range(n):
+            if find(v) != v:
+                continue
+            for w in range(v + 1, n):
+                if colours[w] != colours[v] or find(w) == v:
+                    continue
+                automorphism = self.find_automorphism(colours, v, w)
+                if automorphism is None:
+                    continue
+                # every cycle of the automorphism lies in one orbit
+                for u in range(n):
+                    a, b = find(u), find(automorphism[u])
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+
+        return [find(v) for v in range(n)]
+
+    '''
+        Returns an automorphism, as a list of images, that maps v to w and
+        preserves colours, or None if there is none
+    '''
+    def find_automorphism(self, colours, v, w):
+        pair = colours + colours
+        pair[v] = pair[self.n + w] = max(colours) + 1
+        return self.extend(pair, (v, self.n + w))
+
+    '''
+        Searches for an isomorphism from the first copy to the second one
+        that preserves the colouring pair of both copies, which is stable
+        except for the classes of the points in active
+    '''
+    def extend(self, pair, active):
+        n = self.n
+        pair = refine(pair, self.pair_succ, self.pair_pred, active)
+        counts = {}
+        for u in range(n):
+            counts[pair[u]] = counts.get(pair[u], 0) + 1
+        for u in range(n, 2 * n):
+            counts[pair[u]] = counts.get(pair[u], 0) - 1
+        if any(counts.values()):
+            return None
+
+        cells = {}
+        for u in range(2 * n):
+            cells.setdefault(pair[u], []).append(u)
+        split = [c for c in sorted(cells) if len(cells[c]) > 2]
+
+        if not split:
+            images = [0] * n
+            for members in cells.values():
+                images[members[0]] = members[1] - n
+            for u in range(n):
+                if {images[x] for x in self.succ[u]} != self.succ[images[u]]:
+                    return None
+            return images
+
+        # branch on the first cell with more than one point in each copy
+        members = cells[split[0]]
+        v = members[0]
+        fresh = max(pair) + 1
+        for w in members:
+            if w < n:
+                continue
+            attempt = list(pair)
+            attempt[v] = attempt[w] = fresh
+            images = self.extend(attempt, (v, w))
+            if images is not None:
+                return images
+        return None
+
+
+'''
+    Canonical labelling of a frame by individualization-refinement
+
+    Input:
+        succ, pred: successor and predecessor lists of the frame
+
+    Output:
+        I. list giving the canonical label 0, 1, ..., n-1 of every point
+        II. certificate: the sorted tuple of relabelled (x,y) pairs
+
+    Every leaf of the search tree is a colouring with one point per colour,
+    i.e. a relabelling, and the relabelling with the smallest certificate
+    is returned. Isomorphic frames give the same certificate, and different
+    certificates mean different frames up to isomorphism.
+
+    Two leaves with the same certificate differ by an automorphism. Those
+    automorphisms are collected, and of the points of a target cell, a point
+    is skipped if an automorphism fixing the points already individualized
+    maps it to a point that was tried, since it leads to the same
+    certificates. Every node keeps these orbits in a union-find, built from
+    the automorphisms found before it and joined with every later one that
+    fixes its points. When a leaf has the certificate of the first leaf,
+    the search returns to the point where its path left the first path.
+'''
+def canonical_labelling(succ, pred):
+    n = len(succ)
+    edges = [(v, w) for v in range(n) for w in succ[v]]
+    automorphisms = []
+    first = best = None
+
+    # each entry: individualized points, refined colouring, target cell,
+    # position of the next point of the target cell, points tried, orbits
+    stack = [node([], [0] * n, succ, pred, None)]
+    while stack:
+        entry = stack[-1]
+        fixed, colours, target, i, tried, orbits = entry
+        if target is None:
+            stack.pop()
+            certificate = tuple(sorted((colours[v], colours[w]) for v, w in edges))
+            if first is None:
+                first = best = (colours, certificate, fixed)
+                continue
+            for leaf in (first, best):
+                if leaf[1] == certificate:
+                    # the map sending every point to the point with the same label
+                    position = {c: v for v, c in enumerate(leaf[0])}
+                    automorphism = [position[c] for c in colours]
+                    automorphisms.append(automorphism)
+                    # the nodes on the stack whose points it fixes form a prefix
+                    for other in stack:
+                        if any(automorphism[v] != v for v in other[0][-1:]):
+                            break
+                        if other[5] is not None:
+                            join_orbits(other[5], automorphism)
+                    break
+            if leaf is first and leaf[1] == certificate:
+                # the automorphism maps the whole subtree below the point where
+                # this path left the first path onto a subtree already searched
+                depth = 0
+                while fixed[depth] == first[2][depth]:
+                    depth += 1
+                del stack[depth + 1:]
+            elif certificate < best[1]:
+                best = (colours, certificate, fixed)
+            continue
+
+        if tried:
+            # the orbits are only needed once a point of the target was tried
+            if orbits is None:
+                orbits = entry[5] = list(range(n))
+                for automorphism in automorphisms:
+                    if all(automorphism[v] == v for v in fixed):
+                        join_orbits(orbits, automorphism)
+            skipped = {find_orbit(orbits, v) for v in tried}
+            while i < len(target) and find_orbit(orbits, target[i]) in skipped:
+                i += 1
+        if i == len(target):
+            stack.pop()
+            continue
+        v = target[i]
+        entry[3] = i + 1
+        tried.append(v)
+        stack.append(node(fixed + [v], individualize(colours, [v]), succ, pred, [v]))
+
+    if best is None:
+        return [], ()
+    return best[0], best[1]
+
+
+'''
+    Union-find of orbits: parent pointers, with the smallest point of every
+    orbit as its root
+'''
+def find_orbit(parent, v):
+    while parent[v] != v:
+        parent[v] = parent[parent[v]]
+        v = parent[v]
+    return v
+
+
+'''
+    Joins the orbits of every point and its image under a permutation
+'''
+def join_orbits(parent, permutation):
+    for u, image in enumerate(permutation):
+        if u == image:
+            continue
+        a, b = find_orbit(parent, u), find_orbit(parent, image)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+
+'''
+    Refines a colouring, stable except for the classes of the points in
+    active, and returns a node of the canonical labelling search
+'''
+def node(fixed, colours, succ, pred, active):
+    colours = refine(colours, succ, pred, active)
+    cells = {}
+    for v, c in enumerate(colours):
+        cells.setdefault(c, []).append(v)
+    target = next((cells[c] for c in sorted(cells) if len(cells[c]) > 1), None)
+    return [fixed, colours, target, 0, [], None]
+
+
+'''
+    Input:
+        points: array of worlds
+        R: set of (x,y) pairs representing relation from x to y
+    Output:
+        I. dictionary giving the canonical label of every point
+        II. key that is equal for two frames exactly when they are isomorphic
+'''
+def canonical_form(points, R):
+    points = list(points)
+    labels, certificate = canonical_labelling(*adjacency_lists(points, R))
+    return dict(zip(points, labels)), (len(points), certificate)
@@ -2,13 +2,34 @@
 import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
-from collections import deque
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from adjacency import CSRGraph
+from bitrelation import BitRelation
+from reachability import scc_transitive_closure
+from unionfind import connected_components
+
+
+# edges drawn by visualize_3d before it switches to a random sample
+MAX_DRAWN_EDGES = 2000
 
 
 ''' 
     Displays 3D graph. Modified to work with matplotlib
+
+    All nodes are drawn with two scatter calls (reflexive and irreflexive),
+    all edges with one Line3DCollection and all arrowheads with one quiver,
+    so the number of artists does not grow with the graph.
+
+    Input:
+        graph: networkx graph to draw
+        positions: dictionary of 3D coordinates of the nodes
+        ax: matplotlib 3D axes
+        title: optional title of the plot
+        max_edges: level of detail threshold. If the graph has more edges,
+        a random sample of max_edges edges is drawn instead
 '''
-def visualize_3d(graph, positions, ax, title=None):
+def visualize_3d(graph, positions, ax, title=None, max_edges=MAX_DRAWN_EDGES):
     if title != None:
         ax.set_title(title)
 
@@ -18,28 +39,34 @@ def visualize_3d(graph, positions, ax, title=None):
     color_startrr = 'red'
 
     # draw nodes
-    for node in graph:
-        coord = positions[node]
-        ax.scatter(coord[0], coord[1], coord[2], color=color_refl if (node, node) in graph.edges else color_irr)
+    nodes = list(graph)
+    coords = np.array([positions[node] for node in nodes], dtype=float).reshape(-1, 3)
+    reflexive = np.array([graph.has_edge(node, node) for node in nodes], dtype=bool)
+    for mask, color in ((reflexive, color_refl), (~reflexive, color_irr)):
+        if mask.any():
+            ax.scatter(coords[mask, 0], coords[mask, 1], coords[mask, 2], color=color)
 
     # draw edges
-    for edge in graph.edges:
-        if edge[0] != edge[1]:
-            coordinates_start = positions[edge[0]]
-            coordinates_end = positions[edge[1]]
-
-            vector_start = np.array(coordinates_start)
-            vector_end = np.array(coordinates_end)
-
-            ax.plot([vector_start[0], vector_end[0]], 
-                    [vector_start[1], vector_end[1]], 
-                    [vector_start[2], vector_end[2]], color=color_edge)
-
-            vector_arrow = vector_end - vector_start
-            axis = 0.5 * vector_arrow
-            ax.quiver(vector_start[0], vector_start[1], vector_start[2],
-                      axis[0], axis[1], axis[2],
-                      color=color_startrr, length=np.linalg.norm(vector_arrow)/3)
+    edges = [(x, y) for (x, y) in graph.edges if x != y]
+    if max_edges is not None and len(edges) > max_edges:
+        rng = np.random.default_rng(0)
+        keep = np.sort(rng.choice(len(edges), size=max_edges, replace=False))
+        edges = [edges[k] for k in keep]
+
+    if edges:
+        vector_start = np.array([positions[x] for (x, y) in edges], dtype=float)
+        vector_end = np.array([positions[y] for (x, y) in edges], dtype=float)
+
+        segments = np.stack([vector_start, vector_end], axis=1)
+        ax.add_collection3d(Line3DCollection(segments, colors=color_edge))
+
+        # arrow of half the edge, scaled by a third of its length
+        vector_arrow = vector_end - vector_start
+        lengths = np.linalg.norm(vector_arrow, axis=1) / 3
+        axis = 0.5 * vector_arrow * lengths[:, None]
+        ax.quiver(vector_start[:, 0], vector_start[:, 1], vector_start[:, 2],
+                  axis[:, 0], axis[:, 1], axis[:, 2],
+                  color=color_startrr)
 
     ax.set_xlabel('X')
     ax.set_ylabel('Y')
@@ -51,23 +78,14 @@ def visualize_3d(graph, positions, ax, title=None):
     binary relation R on Xn = {0, 1, ..., n-1}
 '''
 def getMatrix(n,R):
-    M = np.zeros((n, n)) # create 0 matrix of size nxn
-    
-    for (i,j) in R:
-        M[i][j] = 1
-
-    return M
+    return BitRelation.from_relation(n, R).to_matrix().astype(np.float64)
 
 '''
     Create a relation to represent the 0-1 matrix
 '''
 def getRelation(n, M):
-    R = set()
-    for i in range(0,n):
-        for j in range(0,n):
-            if M[i][j] != 0:
-                R.add((i,j))
-    return R
+    src, dst = np.nonzero(np.asarray(M)[:n, :n])
+    return set(zip(src.tolist(), dst.tolist()))
             
 
 '''
@@ -78,13 +96,12 @@ def getRelation(n, M):
     called the reflexive closure of R).
 '''
 def reflexive_closure(n, R):
-    M = getMatrix(n,R)
+    M = BitRelation.from_relation(n, R)
     
     # Mii = 1 for all i = 0, 1, ..., n-1
-    for i in range(n):
-        M[i][i] = 1
+    M.add_diagonal()
    
-    R_prime = getRelation(n,M)
+    R_prime = M.to_relation()
     return R_prime
 
 
@@ -97,15 +114,12 @@ def reflexive_closure(n, R):
 '''
 def symmetric_closure(n, R):
 
-    M = getMatrix(n,R)
+    M = BitRelation.from_relation(n, R)
     
     # Mij = Mji for all i = 0, 1, ..., n-1
-    for i in range(0,n):
-        for j in range(0,n):
-            if M[i][j] == 1:
-                M[j][i] = 1
+    M = M | M.transpose()
     
-    R_prime = getRelation(n,M)
+    R_prime = M.to_relation()
     return R_prime
 
 
@@ -119,21 +133,14 @@ def symmetric_closure(n, R):
 '''
 def floyd_transitive_closure(n, R):
 
-    M = getMatrix(n,R)
+    M = BitRelation.from_relation(n, R)
     
-    # intermediate node
-    # check if there exists a path from node i to node  j through node k.
-    for k in range(n): 
-        # start node
-        for i in range(n): 
-            # end node
-            for j in range(n): 
-                #  checks if there is a direct path from i to j (M[i][j]).
-                # OR if there is a path from i to k (M[i][k]) and a path from 
-                # k to j (M[k][j]), then it sets M[i][j] to True.
-                M[i][j] = M[i][j] or (M[i][k] and M[k][j])
+    # intermediate node k: every node i with a path to k (M[i][k])
+    # gets all nodes j reachable from k (M[k][j]), one word-level
+    # OR over all such rows i at once
+    M = M.warshall_closure()
                 
-    R_prime = getRelation(n,M)
+    R_prime = M.to_relation()
     return R_prime
 
 
@@ -141,18 +148,22 @@ def floyd_transitive_closure(n, R):
     Exercise 2.5
     Calculates the transitive closure as M U M^2 U M^4 U ...
     Input: a positive integer n; a relation R on Xn
+        method: "squaring" for repeated squaring, or "scc" to go through the
+        strongly connected components, which is much faster for sparse R
+        compressed: only for "scc", return a CompressedClosure (SCC of every
+        point plus the components reachable from each SCC) instead of pairs
     Output: the transitive closure of R.
 
 '''
-import numpy as np
-
-def transitive_closure(n, R):
-    M = getMatrix(n, R)
-    a = 1
-    while a < n:
-        a *= 2
-        M  += np.dot(M, M)
-    R_prime = getRelation(n, M)
+def transitive_closure(n, R, method="squaring", compressed=False):
+    if method == "scc":
+        return scc_transitive_closure(n, R, compressed)
+    if method != "squaring":
+        raise ValueError(f"Unknown transitive closure method {method}")
+
+    M = BitRelation.from_relation(n, R)
+    M = M.squaring_closure()
+    R_prime = M.to_relation()
     return R_prime
     
 
@@ -163,60 +174,13 @@ def transitive_closure(n, R):
 '''
 def find_connected_components(n, R):
     
-    # Write the graph as dictionary,  
-    # where each key is a node, and each 
-    # value is an array of neighbors
-    graph = {}
-    
-    for i in range(n):
-        graph[i] = []
-
-    for (a, b) in R:
-        graph[a].append(b)  # R
-        graph[b].append(a)  # R^-1 
-
-    # set for tracking visited nodes
-    visited = set() 
-
-    # array of sets for tracking connected components
-    components = []
-
-    # Find all connected components using BFS
-    for node in range(0, n):
-        if node not in visited:
-            result =  bfs(graph, node)
-            for node in result:
-                visited.add(node)
-            components.append(result)
+    # Merge the endpoints of every edge with union-find,
+    # then group the points by component
+    components = connected_components(n, R, as_sets=True)
     
     return components
 
 
-'''
-    Helper method to perform BFS to find all nodes 
-    in same connected component
-'''
-def bfs(graph, start_node):
-    # set for tracking visited nodes
-    visited = set()
-
-    # queue to track the nodes to explore
-    # add start node to the queue
-    queue = deque([start_node])
-    
-    while queue:
-        # dequeue front node
-        node = queue.popleft()
-        if node not in visited:
-            # add current node to visted array
-            visited.add(node)
-
-            # Add neighbors to the queue
-            neighbors = graph[node]
-            queue.extend(neighbors)
-    
-    return visited
-
 '''
     Exercise 2.7
     Input: positive integer n; a natural l < n; a relation R on Xn
@@ -224,19 +188,13 @@ def bfs(graph, start_node):
 '''
 def find_subframe(n,l, R):
     
-    # Write the graph as dictionary,  
-    # where each key is a node, and each 
-    # value is an array of neighbors
-    graph = {}
-    
-    for i in range(n):
-        graph[i] = []
-
-    for (a, b) in R:
-        graph[a].append(b) 
+    # Write the graph in compressed sparse row form,
+    # where the successors of each node are stored
+    # in one array of neighbors
+    graph = CSRGraph(range(n), R)
 
-    # Find connected components starting from l using BFS
-    subframe =  bfs(graph, l)
+    # Find all nodes reachable from l using BFS
+    subframe = graph.reachable(l)
    
     return subframe
 
@@ -20,19 +20,12 @@ import closures
 import modalFormula
 import mequivalence
 import pmorphism
+from pmcache import PERSISTENT_CACHE_FILE, PMorphismOracle
+from storage import get_data_file_path
 
 from settings_ui import Ui_Settings
 
 
-'''
-    Gets data output path
-'''
-def get_data_file_path(filename):
-    home_dir = os.path.expanduser("~")
-    output_dir = os.path.join(home_dir, "finiteStructures_output")
-    os.makedirs(output_dir, exist_ok=True)
-    return os.path.join(output_dir, filename)
-
 '''
     Checks if program is running in docker
 '''
@@ -815,6 +808,9 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     icon_path = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), "icon.ico")
     app.setWindowIcon(QIcon(icon_path))
+    # reuse the p-morphism answers of earlier runs
+    pmorphism.oracle = PMorphismOracle(pmorphism.check_p_morphism,
+                                       path=get_data_file_path(PERSISTENT_CACHE_FILE))
     window = MyMainWindow()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
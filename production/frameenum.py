@@ -0,0 +1,212 @@
+'''
+    Enumeration of all frames of a given size up to isomorphism.
+
+    Frames are generated by canonical augmentation: a frame on k+1 points
+    is built from a frame on k points (its parent) by adding a new point
+    with any sets of successors and predecessors. Every frame C has one
+    canonical parent, C minus its canonical deletion point, which is chosen
+    in an isomorphism-invariant way. A child is accepted only if the new
+    point is in the same orbit of the automorphisms of C as its canonical
+    deletion point, and isomorphic children of one parent are kept once,
+    so every isomorphism class is generated exactly once.
+
+    Reflexive, transitive and symmetric frames are closed under taking
+    subframes, so restricting every level to the class still generates all
+    frames of the class.
+
+    The search is depth-first and yields frames as soon as they are found.
+    The frames on split_depth points are numbered in the order they are
+    found; part (i, m) of the enumeration only extends the frames whose
+    number is i modulo m, and a checkpoint file records the last one done,
+    so an interrupted enumeration resumes after it.
+'''
+import json
+import os
+
+from canonical import Automorphisms, canonical_labelling
+from pmorphism import Frame
+from pmsearch import bits, popcount
+
+
+'''
+    Returns the successor and predecessor lists of a frame given by
+    successor bitmasks
+'''
+def mask_lists(succ):
+    succ_lists = [list(bits(mask)) for mask in succ]
+    pred_lists = [[] for _ in succ]
+    for x, successors in enumerate(succ_lists):
+        for y in successors:
+            pred_lists[y].append(x)
+    return succ_lists, pred_lists
+
+
+'''
+    Returns whether a frame given by successor bitmasks is transitive
+'''
+def is_transitive(succ):
+    for x, mask in enumerate(succ):
+        for y in bits(mask):
+            if succ[y] & ~mask:
+                return False
+    return True
+
+
+'''
+    Returns the successor bitmasks of the canonical form of a frame with
+    n points, given by its certificate
+'''
+def certificate_masks(n, certificate):
+    succ = [0] * n
+    for x, y in certificate:
+        succ[x] |= 1 << y
+    return tuple(succ)
+
+
+'''
+    Decides whether the last point of a frame is its canonical deletion
+    point, up to automorphisms
+
+    The canonical deletion point is, of the points with the largest
+    (out-degree, in-degree, reflexive) invariant, the one with the largest
+    canonical label.
+
+    Input:
+        succ: successor bitmasks of the frame
+    Output:
+        the certificate of the frame if the last point is accepted,
+        None otherwise
+'''
+def accepted_certificate(succ):
+    n = len(succ)
+    new = n - 1
+    pred = [0] * n
+    for x, mask in enumerate(succ):
+        for y in bits(mask):
+            pred[y] |= 1 << x
+    invariant = [(popcount(succ[v]), popcount(pred[v]), succ[v] >> v & 1) for v in range(n)]
+    best = max(invariant)
+    if invariant[new] != best:
+        return None
+
+    succ_lists, pred_lists = mask_lists(succ)
+    labels, certificate = canonical_labelling(succ_lists, pred_lists)
+    deletion = max((v for v in range(n) if invariant[v] == best), key=lambda v: labels[v])
+    if deletion != new:
+        automorphisms = Automorphisms(succ_lists, pred_lists)
+        if automorphisms.find_automorphism(automorphisms.colours, new, deletion) is None:
+            return None
+    return certificate
+
+
+'''
+    Yields the canonical forms of the children of a frame
+
+    Input:
+        parent: successor bitmasks of a frame in canonical form on k points
+        reflexive, transitive, symmetric: restrict the children to the class
+    Output:
+        generator of the successor bitmasks of the children in canonical form,
+        one per isomorphism class
+'''
+def children(parent, reflexive=False, transitive=False, symmetric=False):
+    k = len(parent)
+    new = 1 << k
+    seen = set()
+    loops = (1,) if reflexive else (0, 1)
+    for loop in loops:
+        for out_mask in range(1 << k):
+            for in_mask in ((out_mask,) if symmetric else range(1 << k)):
+                succ = [mask | new if in_mask >> x & 1 else mask for x, mask in enumerate(parent)]
+                succ.append(out_mask | (new if loop else 0))
+                if transitive and not is_transitive(succ):
+                    continue
+                certificate = accepted_certificate(succ)
+                if certificate is None or certificate in seen:
+                    continue
+                seen.add(certificate)
+                yield certificate_masks(k + 1, certificate)
+
+
+'''
+    Yields the canonical forms of all frames on n points below a frame on
+    k points, depth first
+'''
+def descendants(frame, n, options):
+    if len(frame) == n:
+        yield frame
+        return
+    for child in children(frame, **options):
+        yield from descendants(child, n, options)
+
+
+'''
+    Reads the number of the last finished frame of a checkpoint file,
+    or -1 if there is none. The file must describe the same enumeration.
+'''
+def read_checkpoint(path, settings):
+    if path is None or not os.path.exists(path):
+        return -1
+    with open(path) as file:
+        state = json.load(file)
+    if state["settings"] != settings:
+        raise ValueError(f"Checkpoint {path} belongs to a different enumeration: {state['settings']}")
+    return state["done"]
+
+
+'''
+    Records the number of the last finished frame in a checkpoint file
+'''
+def write_checkpoint(path, settings, done):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump({"settings": settings, "done": done}, file)
+    os.replace(temporary, path)
+
+
+'''
+    Enumerates the frames on n points up to isomorphism
+
+    Input:
+        n: number of points
+        reflexive, transitive, symmetric: only frames of the class
+        part: (i, m) to enumerate only the i-th of m parts (0 <= i < m);
+        together the parts give every frame exactly once
+        checkpoint: path of a checkpoint file; an enumeration with the same
+        settings resumes after the last frame on split_depth points it
+        finished. Frames below the frame being extended when it stopped
+        are yielded again.
+        split_depth: number of points of the frames the enumeration is
+        split and checkpointed on (default n - 1)
+
+    Output:
+        generator of frames on the points 0, 1, ..., n-1 in canonical form,
+        one for every isomorphism class
+'''
+def enumerate_frames(n, reflexive=False, transitive=False, symmetric=False,
+                     part=None, checkpoint=None, split_depth=None):
+    options = {"reflexive": reflexive, "transitive": transitive, "symmetric": symmetric}
+    if split_depth is None:
+        split_depth = max(n - 1, 0)
+    if not 0 <= split_depth <= n:
+        raise ValueError(f"split_depth must be between 0 and {n}, not {split_depth}")
+    index, parts = part if part is not None else (0, 1)
+    settings = {"n": n, "part": [index, parts], "split_depth": split_depth, **options}
+    done = read_checkpoint(checkpoint, settings)
+
+    for number, frame in enumerate(descendants((), split_depth, options)):
+        if number % parts != index or number <= done:
+            continue
+        for succ in descendants(frame, n, options):
+            yield Frame(list(range(n)), {(x, y) for x in range(n) for y in bits(succ[x])})
+        if checkpoint is not None:
+            write_checkpoint(checkpoint, settings, number)
+
+
+'''
+    Enumerates the frames with at most n points up to isomorphism, from
+    the smallest (see enumerate_frames)
+'''
+def enumerate_frames_up_to(n, reflexive=False, transitive=False, symmetric=False):
+    for size in range(n + 1):
+        yield from enumerate_frames(size, reflexive, transitive, symmetric)
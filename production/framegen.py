@@ -0,0 +1,167 @@
+'''
+    Random frames for experiments, sampled with NumPy.
+
+    Frames are drawn in batches as boolean adjacency arrays of shape
+    (count, n, n), so a whole batch is sampled with a few array operations
+    instead of one random call per pair. stream_frames draws one batch at a
+    time and yields its frames one by one, so a long experiment never holds
+    more than one batch in memory. Every generator takes a seed, and the same
+    seed always gives the same frames.
+
+    Families:
+        uniform: every pair (x,y) independently with probability density
+        reflexive: uniform, plus every (x,x)
+        serial: uniform, plus one random successor for every point without one
+        dag: uniform pairs going up in a random order of the points
+        transitive_dag: transitive closure of a dag (a strict partial order)
+        partial_order: reflexive closure of a transitive_dag
+        preorder: reflexive transitive closure of uniform (an S4 frame)
+        tree: every point but the root 0 has one random parent before it
+        transitive_tree: transitive closure of a tree
+        clusters: disjoint union of clusters (an S5 frame), where a point
+        starts a new cluster with probability 1 - density
+'''
+import numpy as np
+
+from pmorphism import Frame
+
+
+FAMILIES = ("uniform", "reflexive", "serial", "dag", "transitive_dag", "partial_order",
+            "preorder", "tree", "transitive_tree", "clusters")
+
+# number of cells of the adjacency arrays sampled at once by stream_frames
+STREAM_CELLS = 1 << 22
+
+
+'''
+    Transitive closure of a batch of relations by repeated squaring
+
+    Input:
+        M: boolean array of shape (count, n, n)
+    Output:
+        boolean array of the same shape, the transitive closure of every relation
+'''
+def batch_transitive_closure(M):
+    M = M.copy()
+    while True:
+        A = M.astype(np.float32)
+        closed = M | (np.matmul(A, A) > 0)
+        if np.array_equal(closed, M):
+            return M
+        M = closed
+
+
+'''
+    Renames the points of every relation of a batch by a random permutation
+'''
+def batch_relabel(M, rng):
+    count, n, _ = M.shape
+    order = rng.permuted(np.tile(np.arange(n), (count, 1)), axis=1)
+    batch = np.arange(count)[:, None, None]
+    return M[batch, order[:, :, None], order[:, None, :]]
+
+
+'''
+    Samples relations of a family
+
+    Input:
+        count: number of relations
+        n: number of points of every relation
+        family: one of FAMILIES
+        density: probability used by the family, between 0 and 1
+        rng: numpy Generator
+    Output:
+        boolean array M of shape (count, n, n), where M[k][x][y] is True
+        iff (x,y) is in the k-th relation
+'''
+def random_matrices(count, n, family="uniform", density=0.5, rng=None):
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown frame family {family}, expected one of {FAMILIES}")
+    if rng is None:
+        rng = np.random.default_rng()
+    diagonal = np.eye(n, dtype=bool)
+
+    if family in ("uniform", "reflexive", "serial", "preorder"):
+        M = rng.random((count, n, n)) < density
+        if family == "reflexive":
+            M |= diagonal
+        elif family == "serial" and n > 0:
+            k, x = np.nonzero(~M.any(axis=2))
+            M[k, x, rng.integers(0, n, size=len(k))] = True
+        elif family == "preorder":
+            M = batch_transitive_closure(M) | diagonal
+        return M
+
+    if family in ("dag", "transitive_dag", "partial_order"):
+        M = (rng.random((count, n, n)) < density) & np.triu(np.ones((n, n), dtype=bool), 1)
+        if family != "dag":
+            M = batch_transitive_closure(M)
+        if family == "partial_order":
+            M |= diagonal
+        return batch_relabel(M, rng)
+
+    if family in ("tree", "transitive_tree"):
+        M = np.zeros((count, n, n), dtype=bool)
+        if n > 1:
+            # parent of x is uniform in 0, 1, ..., x-1
+            children = np.arange(1, n)
+            parents = (rng.random((count, n - 1)) * children).astype(np.int64)
+            M[np.arange(count)[:, None], parents, children] = True
+        if family == "transitive_tree":
+            M = batch_transitive_closure(M)
+        return M
+
+    # clusters: consecutive points share a cluster until a new one starts
+    starts = rng.random((count, n)) >= density
+    starts[:, :1] = True
+    labels = np.cumsum(starts, axis=1)
+    M = labels[:, :, None] == labels[:, None, :]
+    return batch_relabel(M, rng)
+
+
+'''
+    Returns the frame with points 0, 1, ..., n-1 of an adjacency matrix
+'''
+def matrix_frame(M):
+    src, dst = np.nonzero(M)
+    return Frame(list(range(len(M))), set(zip(src.tolist(), dst.tolist())))
+
+
+'''
+    Input:
+        n: number of points
+        family: one of FAMILIES
+        density: probability used by the family, between 0 and 1
+        seed: seed of the random generator, or None
+    Output:
+        a random frame of the family on the points 0, 1, ..., n-1
+'''
+def random_frame(n, family="uniform", density=0.5, seed=None):
+    rng = np.random.default_rng(seed)
+    return matrix_frame(random_matrices(1, n, family, density, rng)[0])
+
+
+'''
+    Yields random frames of a family, one batch at a time
+
+    Input:
+        n: number of points of every frame
+        family: one of FAMILIES
+        density: probability used by the family, between 0 and 1
+        count: number of frames, or None for an endless stream
+        seed: seed of the random generator, or None
+        batch_size: number of frames sampled at once (default: about
+        STREAM_CELLS cells per batch)
+    Output:
+        generator of frames on the points 0, 1, ..., n-1
+'''
+def stream_frames(n, family="uniform", density=0.5, count=None, seed=None, batch_size=None):
+    rng = np.random.default_rng(seed)
+    if batch_size is None:
+        batch_size = max(1, STREAM_CELLS // max(1, n * n))
+    produced = 0
+    while count is None or produced < count:
+        size = batch_size if count is None else min(batch_size, count - produced)
+        for M in random_matrices(size, n, family, density, rng):
+            yield matrix_frame(M)
+        produced += size
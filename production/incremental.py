@@ -0,0 +1,137 @@
+'''
+    Transitive closure that is kept up to date while the relation is edited.
+
+    The relation R on Xn and its transitive closure R+ are both stored as
+    BitRelations. Inserting an edge is a single bitset union over the rows
+    that reach its source, O(n^2/64). Deleting an edge only recomputes the
+    rows of the points that could reach its source, through the strongly
+    connected components of the part of R induced by those points; all other
+    rows of R+ cannot use the deleted edge and are kept.
+'''
+import numpy as np
+
+from adjacency import csr_arrays
+from bitrelation import BitRelation, bit_position, unpack_rows
+from reachability import strongly_connected_components
+
+
+'''
+    Defines a relation together with its transitive closure
+
+    Input:
+        n: number of points, the relation is on Xn = {0, 1, ..., n-1}
+        R: initial set of (x,y) pairs
+
+    Output: Creates an IncrementalClosure object
+
+'''
+class IncrementalClosure:
+    def __init__(self, n, R=()):
+        self.n = n
+        self.relation = BitRelation.from_relation(n, R)
+        self.closure = self.relation.warshall_closure()
+
+    def __repr__(self):
+        return f"IncrementalClosure(n={self.n}, pairs={self.relation.count()}, closure={self.closure.count()})"
+
+    '''
+        Returns whether y is reachable from x by a path of length >= 1
+    '''
+    def reaches(self, x, y):
+        return (x, y) in self.closure
+
+    '''
+        Returns the transitive closure as a set of (x,y) pairs
+    '''
+    def to_relation(self):
+        return self.closure.to_relation()
+
+    '''
+        Adds (x,y) to R and updates the closure
+    '''
+    def add_edge(self, x, y):
+        if (x, y) in self.relation:
+            return
+        self.relation.add_pairs([x], [y])
+        if (x, y) in self.closure:
+            return
+
+        # every point reaching x (and x itself) now reaches y and all of R+[y]
+        sources = self.closure.column(x)
+        sources[x] = True
+        targets = self.closure.rows[y].copy()
+        word, mask = bit_position(y)
+        targets[word] |= mask
+        self.closure.rows[sources] |= targets
+
+    '''
+        Removes (x,y) from R and updates the closure
+    '''
+    def remove_edge(self, x, y):
+        if (x, y) not in self.relation:
+            return
+        word, mask = bit_position(y)
+        self.relation.rows[x, word] &= ~mask
+
+        # only paths starting at a point that reaches x can use (x,y)
+        affected = self.closure.column(x)
+        affected[x] = True
+        self._recompute_rows(np.flatnonzero(affected))
+
+    '''
+        Replaces R by a new set of (x,y) pairs, applying only the differences
+    '''
+    def update(self, R):
+        current = self.relation.to_relation()
+        for (x, y) in current - set(R):
+            self.remove_edge(x, y)
+        for (x, y) in set(R) - current:
+            self.add_edge(x, y)
+
+    '''
+        Recomputes the closure rows of the points in A, assuming the rows of
+        all points outside A are correct. A must be closed under predecessors
+        in the closure, so no point outside A reaches a point in A.
+    '''
+    def _recompute_rows(self, A):
+        n = self.n
+        rows = self.closure.rows
+        local = np.full(n, -1, dtype=np.int64)
+        local[A] = np.arange(len(A))
+
+        # base[a]: successors of a outside A, together with everything they reach
+        src, dst = np.nonzero(unpack_rows(self.relation.rows[A], n))
+        inside = local[dst] >= 0
+        base = np.zeros((len(A), self.closure.words), dtype=np.uint64)
+        out_indptr, out_indices = csr_arrays(len(A), src[~inside], dst[~inside])
+        for i in range(len(A)):
+            outside = out_indices[out_indptr[i]:out_indptr[i + 1]]
+            if len(outside) > 0:
+                base[i] = np.bitwise_or.reduce(rows[outside], axis=0)
+                word, mask = bit_position(outside)
+                np.bitwise_or.at(base[i], word, mask)
+
+        # solve the part of R induced by A through its strongly connected components
+        sub_src, sub_dst = src[inside], local[dst[inside]]
+        indptr, indices = csr_arrays(len(A), sub_src, sub_dst)
+        component, num_components = strongly_connected_components(len(A), indptr, indices)
+        order = np.argsort(component, kind='stable')
+        bounds = np.zeros(num_components + 1, dtype=np.int64)
+        np.cumsum(np.bincount(component, minlength=num_components), out=bounds[1:])
+
+        component_rows = np.zeros((num_components, self.closure.words), dtype=np.uint64)
+        # components are numbered sinks first, so successors are always done
+        for c in range(num_components):
+            members = order[bounds[c]:bounds[c + 1]]
+            row = np.bitwise_or.reduce(base[members], axis=0)
+            targets = np.unique(indices[np.concatenate([np.arange(indptr[m], indptr[m + 1]) for m in members])])
+            if len(targets) > 0:
+                word, mask = bit_position(A[targets])
+                np.bitwise_or.at(row, word, mask)
+                successor_components = np.unique(component[targets])
+                successor_components = successor_components[successor_components != c]
+                if len(successor_components) > 0:
+                    row |= np.bitwise_or.reduce(component_rows[successor_components], axis=0)
+            component_rows[c] = row
+
+        rows[A] = component_rows[component]
@@ -0,0 +1,207 @@
+'''
+    Immutable frame stored as integer arrays.
+
+    The points are kept once, as a tuple of labels, and are otherwise
+    referred to by their indices 0, 1, ..., n-1. The relation is stored in
+    compressed sparse row form: the successors of the point with index i are
+        indices[indptr[i]:indptr[i+1]]
+    in increasing order, with 32-bit integers, so an edge takes 4 bytes
+    instead of a tuple of two labels in a set.
+
+    Data derived from the relation (successor and predecessor bitsets, the
+    strongly connected components, the transitive closure, the canonical
+    key) is computed the first time it is asked for and kept, which is safe
+    because the frame cannot be changed.
+'''
+import numpy as np
+
+from adjacency import csr_arrays
+from canonical import canonical_labelling
+from pmorphism import Frame
+from reachability import condensation_closure, strongly_connected_components
+
+
+'''
+    Defines an immutable integer-indexed frame
+
+    Input:
+        labels: array of worlds; the world labels[i] gets index i
+        src, dst: arrays with the index pairs (src[k], dst[k]) of the relation
+
+    Output: Creates an IndexedFrame object. points and relation give the
+    frame in the form of Frame, so it can be passed to every function that
+    takes a Frame.
+
+'''
+class IndexedFrame:
+    __slots__ = ("labels", "indptr", "indices", "_index", "_succ", "_pred",
+                 "_components", "_closure", "_key")
+
+    def __init__(self, labels, src, dst):
+        labels = tuple(labels)
+        n = len(labels)
+        src = np.asarray(src, dtype=np.int64).reshape(-1)
+        dst = np.asarray(dst, dtype=np.int64).reshape(-1)
+        # sort the pairs and drop repeated ones
+        codes = np.unique(src * n + dst) if n > 0 else np.zeros(0, dtype=np.int64)
+        indptr, indices = csr_arrays(n, codes // max(n, 1), codes % max(n, 1))
+
+        setattr_ = object.__setattr__
+        setattr_(self, "labels", labels)
+        setattr_(self, "indptr", indptr.astype(np.int32))
+        setattr_(self, "indices", indices.astype(np.int32))
+        for slot in ("_index", "_succ", "_pred", "_components", "_closure", "_key"):
+            setattr_(self, slot, None)
+        self.indptr.flags.writeable = False
+        self.indices.flags.writeable = False
+
+    '''
+        Converts a Frame, keeping the order of its points
+    '''
+    @classmethod
+    def from_frame(cls, F):
+        labels = list(F.points)
+        index = {x: i for i, x in enumerate(labels)}
+        pairs = np.array([(index[x], index[y]) for (x, y) in F.relation], dtype=np.int64).reshape(-1, 2)
+        return cls(labels, pairs[:, 0], pairs[:, 1])
+
+    '''
+        Converts back to a Frame
+    '''
+    def to_frame(self):
+        return Frame(list(self.labels), self.relation)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("IndexedFrame is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("IndexedFrame is immutable")
+
+    def __repr__(self):
+        return f"IndexedFrame(n={self.n}, edges={self.edge_count})"
+
+    def __eq__(self, other):
+        if not isinstance(other, IndexedFrame):
+            return NotImplemented
+        return (self.labels == other.labels and np.array_equal(self.indptr, other.indptr)
+                and np.array_equal(self.indices, other.indices))
+
+    def __hash__(self):
+        return hash((self.labels, self.indptr.tobytes(), self.indices.tobytes()))
+
+    def __getstate__(self):
+        return self.labels, self.edges()
+
+    def __setstate__(self, state):
+        labels, (src, dst) = state
+        IndexedFrame.__init__(self, labels, src, dst)
+
+    @property
+    def n(self):
+        return len(self.labels)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    '''
+        Array of worlds, as in Frame
+    '''
+    @property
+    def points(self):
+        return list(self.labels)
+
+    '''
+        Set of (x,y) pairs of worlds, as in Frame
+    '''
+    @property
+    def relation(self):
+        labels = self.labels
+        src, dst = self.edges()
+        return {(labels[i], labels[j]) for i, j in zip(src.tolist(), dst.tolist())}
+
+    '''
+        Returns the index of a world
+    '''
+    def index(self, x):
+        if self._index is None:
+            object.__setattr__(self, "_index", {label: i for i, label in enumerate(self.labels)})
+        return self._index[x]
+
+    '''
+        Returns the (source, target) index arrays of all edges
+    '''
+    def edges(self):
+        return np.repeat(np.arange(self.n), np.diff(self.indptr)), self.indices
+
+    '''
+        Returns the indices of the successors of the point with index i
+    '''
+    def successors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    '''
+        Successor bitsets: bit j of succ_masks[i] is set iff i R j
+    '''
+    @property
+    def succ_masks(self):
+        if self._succ is None:
+            self.compute_masks()
+        return self._succ
+
+    '''
+        Predecessor bitsets: bit i of pred_masks[j] is set iff i R j
+    '''
+    @property
+    def pred_masks(self):
+        if self._pred is None:
+            self.compute_masks()
+        return self._pred
+
+    def compute_masks(self):
+        succ = [0] * self.n
+        pred = [0] * self.n
+        src, dst = self.edges()
+        for i, j in zip(src.tolist(), dst.tolist()):
+            succ[i] |= 1 << j
+            pred[j] |= 1 << i
+        object.__setattr__(self, "_succ", tuple(succ))
+        object.__setattr__(self, "_pred", tuple(pred))
+
+    '''
+        Strongly connected components: (array giving the component of every
+        point, number of components), numbered sinks first
+    '''
+    @property
+    def components(self):
+        if self._components is None:
+            component, count = strongly_connected_components(self.n, self.indptr.astype(np.int64),
+                                                             self.indices.astype(np.int64))
+            component.flags.writeable = False
+            object.__setattr__(self, "_components", (component, count))
+        return self._components
+
+    '''
+        Transitive closure of the relation, as a CompressedClosure on indices
+    '''
+    @property
+    def closure(self):
+        if self._closure is None:
+            src, dst = self.edges()
+            object.__setattr__(self, "_closure", condensation_closure(self.n, src, dst))
+        return self._closure
+
+    '''
+        Returns a key that is equal for two frames exactly when they are
+        isomorphic, the same key as Frame.canonical_key
+    '''
+    def canonical_key(self):
+        if self._key is None:
+            succ = [self.successors(i).tolist() for i in range(self.n)]
+            pred = [[] for _ in range(self.n)]
+            for i in range(self.n):
+                for j in succ[i]:
+                    pred[j].append(i)
+            certificate = canonical_labelling(succ, pred)[1]
+            object.__setattr__(self, "_key", (self.n, certificate))
+        return self._key
@@ -20,6 +20,8 @@
 '''
 
 import pmorphism
+from adjacency import CSRGraph
+from reachability import ReachabilityIndex
 
 
 """
@@ -319,11 +321,13 @@ def generate_m_combinations_of_powerset(G, m):
 '''
 def m_subset(F,G,m):
 
+    # reachability of both frames, computed once for all generated subframes
+    index_F = ReachabilityIndex(CSRGraph(F.points, F.relation))
+    index_G = ReachabilityIndex(CSRGraph(G.points, G.relation))
 
     # for all point-generated subframes of F
     for nodeF in F.points:
-        reachable = pmorphism.find_reachable(F.points, nodeF, F.relation)
-        subrelation = {(x, y) for x, y in F.relation if x in reachable and y in reachable}
+        reachable, subrelation = index_F.generated_subframe(nodeF)
         sub_F = pmorphism.Frame(reachable, subrelation)
 
         # generate all possible combinations of m sets from the powerset of F
@@ -340,8 +344,7 @@ def m_subset(F,G,m):
 
             foundGPrime = False
             for nodeG in G.points: 
-                reachable = pmorphism.find_reachable(G.points, nodeG, G.relation)
-                subrelation = {(x, y) for x, y in G.relation if x in reachable and y in reachable}
+                reachable, subrelation = index_G.generated_subframe(nodeG)
                 sub_G = pmorphism.Frame(reachable, subrelation)
             
                 # generate all possible combinations of m sets from the powerset of G
@@ -356,7 +359,7 @@ def m_subset(F,G,m):
                     G_quotient = pmorphism.Frame(points,eq_R)
 
                     # Check G'/~[v] ->-> F'/~[u]
-                    f = pmorphism.check_p_morphism(G_quotient, F_quotient)
+                    f = pmorphism.oracle.check(G_quotient, F_quotient)
                     if f is not None:
                         foundGPrime = True
                         break
@@ -36,6 +36,11 @@ TOKEN_TYPE_MAP = {
     'T_IMPLICATION': r'-->',
 }
 
+# One pattern for all token types, tried in the order of TOKEN_TYPE_MAP;
+# the name of the matching group is the token type
+TOKEN_PATTERN = re.compile("|".join(f"(?P<{token_type}>{pattern})"
+                                    for token_type, pattern in TOKEN_TYPE_MAP.items()))
+
 
 # Abstract Syntax Tree Node Types
 A_PROPOSITION = 'PROPOSITION'
@@ -79,6 +84,8 @@ class ASTNode:
 
 '''
 class Token:
+    __slots__ = ("type", "value", "position")
+
     def __init__(self, token_type, value=None, position=None):
         self.type = token_type
         self.value = value
@@ -87,6 +94,10 @@ class Token:
 '''
     Class to split the input string into tokens
 
+    Every token is matched by TOKEN_PATTERN at the current index of the
+    input, without copying the rest of the input, so tokenizing takes
+    linear time in the length of the formula.
+
 '''
 class Tokenizer:
     def __init__(self, input_str):
@@ -104,13 +115,11 @@ class Tokenizer:
         return tokens
 
     def next_token(self):
-        for token_type, pattern in TOKEN_TYPE_MAP.items():
-            match = re.match(pattern, self.input[self.index:])
-            if match:
-                value = match.group()
-                token = Token(token_type, value, self.index)
-                self.index += len(value)
-                return token
+        match = TOKEN_PATTERN.match(self.input, self.index)
+        if match:
+            token = Token(match.lastgroup, match.group(), self.index)
+            self.index = match.end()
+            return token
         raise ValueError(f"Invalid token {self.input[self.index]} at position {self.index}")
 
 
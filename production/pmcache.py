@@ -0,0 +1,161 @@
+'''
+    Cache of p-morphism answers, keyed by isomorphism classes of frames.
+
+    The question F ↠ G only depends on F and G up to isomorphism, so answers
+    are stored under the pair of canonical keys of F and G (see canonical).
+    A p-morphism is stored as the map between canonical labels, and is
+    translated back to the points of the frames it is asked for, so an
+    answer found for one pair of frames serves every isomorphic pair.
+
+    Answers are kept in an in-memory LRU cache and, if a path is given, in a
+    shelve file, so later runs of the program reuse them.
+
+    A canonical form can cost far more than the search it saves, e.g. for
+    large clusters, so only frames with at most max_points points, or whose
+    canonical forms are given, go through the cache. Larger frames are
+    passed to solve directly.
+'''
+import shelve
+import threading
+from collections import OrderedDict
+
+from canonical import canonical_form
+
+
+# number of answers kept in memory by default
+DEFAULT_MAXSIZE = 4096
+
+# largest frames canonicalized by default to look up an answer
+CANONICAL_MAX_POINTS = 32
+
+# name of the persistent cache file in the output directory
+PERSISTENT_CACHE_FILE = "pmorphism_cache"
+
+
+'''
+    Defines a cached p-morphism oracle
+
+    Input:
+        solve: function (F, G) -> mapping or None, e.g. check_p_morphism
+        maxsize: number of answers kept in memory
+        path: if given, file of a persistent shelve store of all answers
+        max_points: largest frames that are canonicalized to use the cache
+
+    Output: Creates a PMorphismOracle object. hits counts the answers found in
+    memory or in the store, misses the answers computed by solve and stored,
+    uncached the answers computed by solve for frames too large to cache.
+
+'''
+class PMorphismOracle:
+    def __init__(self, solve, maxsize=DEFAULT_MAXSIZE, path=None, max_points=CANONICAL_MAX_POINTS):
+        self.solve = solve
+        self.maxsize = maxsize
+        self.max_points = max_points
+        self.answers = OrderedDict()
+        self.store = shelve.open(path) if path is not None else None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def __repr__(self):
+        return (f"PMorphismOracle(size={len(self.answers)}, hits={self.hits}, misses={self.misses}, "
+                f"uncached={self.uncached})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    '''
+        Closes the persistent store
+    '''
+    def close(self):
+        with self.lock:
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+
+    '''
+        Forgets all answers in memory and resets the counters
+    '''
+    def clear(self):
+        with self.lock:
+            self.answers.clear()
+            self.hits = 0
+            self.misses = 0
+            self.uncached = 0
+
+    '''
+        Input:
+            F, G: frames containing an array of worlds and set of ordered pair relations
+            form_F, form_G: canonical forms of F and G, if already known
+        Output:
+            If possible, return a mapping f such that F ↠ G. Otherwise, return None
+    '''
+    def check(self, F, G, form_F=None, form_G=None):
+        # a p-morphism is onto the points and onto the pairs of G
+        if len(F.points) < len(G.points) or len(F.relation) < len(G.relation):
+            return None
+        if not (self.cacheable(F, form_F) and self.cacheable(G, form_G)):
+            with self.lock:
+                self.uncached += 1
+            return self.solve(F, G)
+
+        labels_F, key_F = form_F if form_F is not None else canonical_form(F.points, F.relation)
+        labels_G, key_G = form_G if form_G is not None else canonical_form(G.points, G.relation)
+        key = (key_F, key_G)
+
+        answer = self.lookup(key)
+        if answer is None:
+            f = self.solve(F, G)
+            # images of the canonical labels of F, or () if there is no p-morphism
+            answer = () if f is None else tuple(
+                labels_G[y] for x, y in sorted(f.items(), key=lambda item: labels_F[item[0]]))
+            self.remember(key, answer)
+            return f
+
+        if answer == ():
+            return None
+        points_G = {label: y for y, label in labels_G.items()}
+        return {x: points_G[answer[labels_F[x]]] for x in F.points}
+
+    '''
+        Returns whether the answers for a frame are looked up in the cache
+    '''
+    def cacheable(self, F, form):
+        return form is not None or len(F.points) <= self.max_points
+
+    '''
+        Returns the stored answer for a key, or None if it is unknown
+    '''
+    def lookup(self, key):
+        with self.lock:
+            if key in self.answers:
+                self.answers.move_to_end(key)
+                self.hits += 1
+                return self.answers[key]
+            if self.store is not None and repr(key) in self.store:
+                self.hits += 1
+                answer = self.store[repr(key)]
+                self.insert(key, answer)
+                return answer
+            self.misses += 1
+            return None
+
+    '''
+        Stores the answer for a key in memory and in the persistent store
+    '''
+    def remember(self, key, answer):
+        with self.lock:
+            self.insert(key, answer)
+            if self.store is not None:
+                self.store[repr(key)] = answer
+                self.store.sync()
+
+    def insert(self, key, answer):
+        self.answers[key] = answer
+        self.answers.move_to_end(key)
+        while len(self.answers) > self.maxsize:
+            self.answers.popitem(last=False)
@@ -1,7 +1,21 @@
 
 import time
 import random
-from collections import deque
+
+import numpy as np
+
+from adjacency import CSRGraph
+from bisimulation import bisimulation_quotient
+from canonical import canonical_form
+from pmcache import CANONICAL_MAX_POINTS, PMorphismOracle
+from pmparallel import parallel_search
+from pmsearch import SearchProblem, iter_assignments, iter_propagated, neighbour_masks, point_invariants
+from reachability import ReachabilityIndex
+
+
+# number of cells of the arrays built at once by is_p_morphism_batch
+BATCH_CELLS = 1 << 22
+
 
 '''
     Defines a Frame
@@ -23,6 +37,13 @@ class Frame:
     def __repr__(self):
         return f"Frame(points={self.points}, relation={self.relation})"
 
+    '''
+        Returns a key that is equal for two frames exactly when they are
+        isomorphic (see canonical.canonical_form)
+    '''
+    def canonical_key(self):
+        return canonical_form(self.points, self.relation)[1]
+
 
 '''
     Input:
@@ -72,54 +93,88 @@ def is_p_morphism(f, F, G):
 
 
 '''
-    Incrementally build a mapping f, while checking if the current partial 
-    mapping can potentially lead to a valid p-morphism. 
-    If a valid mapping is found, return True; otherwise, backtrack.
+    Input:
+        maps: 2-D integer array with one candidate map per row, where
+        maps[i][j] is the index in G.points of the image of the j-th point
+        of F.points
+        F, G: frames containing an array of worlds and set of ordered pair relations
+        chunk_cells: maps are checked in chunks of about this many cells of
+        the (maps, |F|, |G|) arrays
+    Output:
+        boolean array, True for the rows of maps that are p-morphisms from
+        F onto G
 
+    Every map is written as a one-hot matrix H (H[x][u] = 1 iff f(x) = u),
+    so the images f[R(x)] of all successor sets are the nonzero entries of
+    the product A H, where A is the adjacency matrix of F. The forward and
+    back conditions together say that f[R(x)] = S(f(x)) for every x.
 '''
-def build_pMorph(F, G, k, f, points_F, points_G):
-    R = F.relation
-    S = G.relation
-    n = len(points_F)
-    
-    # Base case: all points in F are assigned to G. 
-    # Return whether f is p-morphism
-    if k >= n:
-        return(is_p_morphism(f, F, G))
-          
-    for y in points_G:
-        f[points_F[k]] = y
-
-        valid = True
-        # Forward condition
-        for i in range(k):
-            if (points_F[i], points_F[k]) in R and (f[points_F[i]], f[points_F[k]]) not in S:
-                valid = False
-                break
-            if (points_F[k], points_F[i]) in R and (f[points_F[k]], f[points_F[i]]) not in S:
-                valid = False
-                break
+def is_p_morphism_batch(maps, F, G, chunk_cells=BATCH_CELLS):
+    maps = np.asarray(maps, dtype=np.int64).reshape(-1, len(F.points))
+    n, m = len(F.points), len(G.points)
+    index_F = {x: i for i, x in enumerate(F.points)}
+    index_G = {u: i for i, u in enumerate(G.points)}
+    A = np.zeros((n, n), dtype=np.float32)
+    for (x, y) in F.relation:
+        A[index_F[x], index_F[y]] = 1
+    B = np.zeros((m, m), dtype=bool)
+    for (u, v) in G.relation:
+        B[index_G[u], index_G[v]] = True
+
+    result = np.zeros(len(maps), dtype=bool)
+    chunk_size = max(1, chunk_cells // max(1, n * m))
+    for start in range(0, len(maps), chunk_size):
+        chunk = maps[start:start + chunk_size]
+        rows = np.arange(len(chunk))[:, None]
+        one_hot = np.zeros((len(chunk), n, m), dtype=np.float32)
+        one_hot[rows, np.arange(n), chunk] = 1
+
+        # surjective
+        ok = one_hot.any(axis=1).all(axis=1)
+        # f[R(x)] = S(f(x)) for all x
+        images = np.matmul(A, one_hot) > 0
+        ok &= (images == B[chunk]).all(axis=(1, 2))
+        result[start:start + len(chunk)] = ok
+    return result
 
 
-        # Back condition
-        # for all x ∈ X1, u ∈ X2 , if f(x) R2 u --> ∃ x' ∈ x1  x R1 x' and f(x') = u
-        if valid == True:
-            for i in range(k):
-                
-                for j in points_G:
-                    if (f[points_F[i]], j) in S:
-                        valid = False
-                        for p in range(n):
-                            if ((p < k) and (points_F[i],points_F[p]) in R and f[points_F[p]] == j)\
-                                or ((p >= k) and (points_F[i], points_F[p]) in R):
-                                valid = True
-                                break
-                            
-                        if valid == False:
-                            break
-
-        if valid and build_pMorph(F, G, k + 1, f, points_F, points_G):
-            return True
+'''
+    Returns the generator of image tuples of a search problem for the given
+    search method, see build_pMorph
+'''
+def search(problem, method="propagate"):
+    if method == "propagate":
+        return iter_propagated(problem, symmetry=problem.automorphisms())
+    if method == "backtrack":
+        return iter_assignments(problem)
+    raise ValueError(f"Unknown p-morphism search method {method}")
+
+
+'''
+    Incrementally build a mapping f, while checking if the current partial 
+    mapping can potentially lead to a valid p-morphism. 
+    If a valid mapping is found, store it in f and return True; otherwise, backtrack.
+
+    Points are replaced by their indices, and the successors of every point
+    of F and G are computed once as bitmasks, so the forward and back 
+    conditions are subset tests on bitmasks (see pmsearch). The possible 
+    images of every point are first restricted by invariants, and the search 
+    stops at once if a point has no possible image or a point of G cannot 
+    be covered.
+    With propagation, a choice f(x) = b is skipped when a choice f(x) = a
+    symmetric to it under the automorphisms of G already failed.
+
+    Input:
+        method: "propagate" to keep the domains of all points arc consistent
+        after every choice (pmsearch.iter_propagated), or "backtrack" to
+        assign the points in order and only check the assigned ones
+        (pmsearch.iter_assignments)
+'''
+def build_pMorph(F, G, f, method="propagate"):
+    problem = SearchProblem(F, G)
+    for images in search(problem, method):
+        f.update(problem.mapping(images))
+        return True
     return False
 
 
@@ -132,6 +187,12 @@ def build_pMorph(F, G, k, f, points_F, points_G):
 
     Input:
         F, G: frames containing an array of worlds and set of ordered pair relations
+        method: search method of build_pMorph
+        workers: if greater than 1, split the search into subproblems solved
+        by this many processes (see pmparallel); the result is the same
+        mapping as the sequential search returns
+        split_depth: number of choices made by every subproblem (None to
+        choose it from the number of workers)
     
     Output: 
         If possible, return a mapping f such that F ↠ G. Otherwise, return None
@@ -139,17 +200,97 @@ def build_pMorph(F, G, k, f, points_F, points_G):
     Time complexity:
     O(|G|^|F|) 
 '''
-def check_p_morphism(F, G):
+def check_p_morphism(F, G, method="propagate", workers=None, split_depth=None):
     # surjective not possible
     if len(F.points) < len(G.points):
         return None
 
+    if workers is not None and workers > 1:
+        if method != "propagate":
+            raise ValueError(f"Parallel p-morphism search needs method propagate, not {method}")
+        problem = SearchProblem(F, G)
+        images = parallel_search(problem, workers, split_depth)
+        if images is None:
+            return None
+        return problem.mapping(images)
+
     f = {}
-    if build_pMorph(F, G, 0, f, list(F.points), list(G.points)):
+    if build_pMorph(F, G, f, method):
         return f
     return None
 
 
+'''
+    Enumerates all p-morphisms from F onto G, one at a time, with the same
+    pruned search as check_p_morphism. Only the current branch of the search
+    is kept in memory, never the list of mappings.
+
+    Input:
+        F, G: frames containing an array of worlds and set of ordered pair relations
+        limit: stop after this many p-morphisms (None for all)
+        compact: if True, yield every p-morphism as the tuple of images of
+        F.points, in order, instead of a dictionary
+        method: search method of build_pMorph
+
+    Output:
+        generator of the p-morphisms f such that F ↠ G
+'''
+def iter_p_morphisms(F, G, limit=None, compact=False, method="propagate"):
+    if len(F.points) < len(G.points) or limit == 0:
+        return
+    problem = SearchProblem(F, G)
+    points_G = problem.points_G
+    found = 0
+    for images in search(problem, method):
+        if compact:
+            yield tuple(points_G[a] for a in images)
+        else:
+            yield problem.mapping(images)
+        found += 1
+        if found == limit:
+            return
+
+
+'''
+    Counts the p-morphisms from F onto G without building any of them
+
+    Input:
+        F, G: frames containing an array of worlds and set of ordered pair relations
+        limit: stop counting at this many p-morphisms (None for all)
+        method: search method of build_pMorph
+
+    Output:
+        number of p-morphisms f such that F ↠ G (at most limit)
+'''
+def count_p_morphisms(F, G, limit=None, method="propagate"):
+    if len(F.points) < len(G.points) or limit == 0:
+        return 0
+    count = 0
+    for _ in search(SearchProblem(F, G), method):
+        count += 1
+        if count == limit:
+            break
+    return count
+
+
+# answers of check_p_morphism, shared by all frames up to isomorphism
+oracle = PMorphismOracle(check_p_morphism)
+
+
+'''
+    Computes the smallest p-morphic image of F, its quotient by the largest
+    bisimulation (see bisimulation)
+
+    Output:
+        I. the quotient frame, with points 0, 1, ..., k-1
+        II. dictionary mapping every point of F to its class, a p-morphism
+        from F onto the quotient
+'''
+def minimal_quotient(F):
+    points, relation, projection = bisimulation_quotient(F.points, F.relation)
+    return Frame(points, relation), projection
+
+
 '''
     Helper method to display result of check_p_morphism
 '''
@@ -172,86 +313,144 @@ def printIsPMorph(F,G, f):
    
 
 
-'''
-    Helper method to perform BFS to find all nodes 
-    in same connected component
-'''
-def bfs(graph, start_node):
-    # set for tracking visited nodes
-    visited = set()
-
-    # queue to track the nodes to explore
-    # add start node to the queue
-    queue = deque([start_node])
-    
-    while queue:
-        # dequeue front node
-        node = queue.popleft()
-        if node not in visited:
-            # add current node to visted array
-            visited.add(node)
-
-            # Add neighbors to the queue
-            neighbors = graph[node]
-            queue.extend(neighbors)
-    
-    return visited
-
-
 '''
     Exercise 2.7
     Input: 
         worlds: set of all possible worlds
         start: starting world
         R: set of (x,y) pairs representing relation from x to y
+        graph: optional CSRGraph of (worlds, R), so frames queried
+        many times build their adjacency only once
         
     Output: set of the reachable worlds from the start node
 '''
-def find_reachable(worlds, start, R):
-    
-    # Write the graph as dictionary,  
-    # where each key is a node, and each 
-    # value is an array of neighbors
-    graph = {}
+def find_reachable(worlds, start, R, graph=None):
     
-    for world in worlds:
-        graph[world] = []
+    # Write the graph in compressed sparse row form,  
+    # where the successors of each node are stored
+    # in one array of neighbors
+    if graph is None:
+        graph = CSRGraph(worlds, R)
 
-    for (a, b) in R:
-        graph[a].append(b) 
-
-    # Find connected components starting from l using BFS
-    reachable =  bfs(graph, start)
+    # Find all nodes reachable from start using BFS
+    reachable = graph.reachable(start)
 
     return reachable
 
 
 '''
-    Returns whether Log(F) ⊆ Log(G)
+    Returns invariants of a frame that rule out p-morphisms F ↠ G:
+    number of points, number of pairs, largest out-degree, and the set of
+    heights of its points. A p-morphism is onto the points and the pairs of
+    G, does not increase out-degrees, and keeps the height of every point,
+    so F and G have the same set of heights.
 '''
-def log_subset(F, G):
-    subframes_F = []
-    for node in F.points:
-        reachable = find_reachable(F.points, node, F.relation)
-        subrelation = {(x, y) for x, y in F.relation if x in reachable and y in reachable}
-        subframes_F.append(Frame(reachable, subrelation))
-    
-    subframes_G = []
-    for node in G.points:
-        reachable = find_reachable(G.points, node, G.relation)
-        subrelation = {(x, y) for x, y in G.relation if x in reachable and y in reachable}
-        subframes_G.append(Frame(reachable, subrelation))
+def frame_profile(F):
+    succ, pred = neighbour_masks(list(F.points), F.relation)
+    invariants = point_invariants(succ)
+    return (len(succ), len(F.relation), max(invariants['outdegree'], default=0),
+            frozenset(invariants['height']))
+
+
+'''
+    Returns whether the profiles of F and G allow a p-morphism F ↠ G
+'''
+def profile_allows(profile_F, profile_G):
+    return (profile_F[0] >= profile_G[0] and profile_F[1] >= profile_G[1]
+            and profile_F[2] >= profile_G[2] and profile_F[3] == profile_G[3])
+
+
+'''
+    Returns the point-generated subframes of F, one per isomorphism class
+
+    All points of a strongly connected component generate the same
+    subframe, so one subframe is built per component. Subframes are first
+    told apart by their profile and out-degrees; canonical forms are only
+    computed for subframes whose cheap keys collide, and for subframes with
+    at most CANONICAL_MAX_POINTS points, which the oracle would
+    canonicalize anyway.
 
+    Output:
+        array of (subframe, canonical form or None, profile, quotient key)
+        tuples, where quotient key is the canonical key of the minimal
+        quotient of the subframe if minimize is True, and None otherwise
+'''
+def generated_subframes(F, minimize=False):
+    index = ReachabilityIndex(CSRGraph(F.points, F.relation))
+    component = index.closure.component
+    done = set()
+    # cheap key -> entries with that key, as lists so forms can be filled in
+    buckets = {}
+    for i, node in enumerate(index.graph.points):
+        if component[i] in done:
+            continue
+        done.add(component[i])
+        reachable, subrelation = index.generated_subframe(node)
+        sub = Frame(reachable, subrelation)
+        profile = frame_profile(sub)
+        outdegrees = {}
+        for (x, y) in subrelation:
+            outdegrees[x] = outdegrees.get(x, 0) + 1
+        cheap_key = (profile, tuple(sorted(outdegrees.values())))
+        entry = [sub, None, profile, None]
+        if len(reachable) <= CANONICAL_MAX_POINTS:
+            entry[1] = canonical_form(sub.points, sub.relation)
+
+        bucket = buckets.setdefault(cheap_key, [])
+        if bucket:
+            # same cheap key: compare canonical keys
+            for other in bucket:
+                if other[1] is None:
+                    other[1] = canonical_form(other[0].points, other[0].relation)
+            if entry[1] is None:
+                entry[1] = canonical_form(sub.points, sub.relation)
+            if any(other[1][1] == entry[1][1] for other in bucket):
+                continue
+        if minimize:
+            entry[3] = minimal_quotient(sub)[0].canonical_key()
+        bucket.append(entry)
+    return [tuple(entry) for bucket in buckets.values() for entry in bucket]
+
+
+'''
+    Returns whether Log(F) ⊆ Log(G)
+
+    Isomorphic point-generated subframes are checked once. For every G′,
+    the subframes F′ that were witnesses for an earlier G′ are tried first,
+    then the others from the smallest, and pairs whose profiles rule out
+    F′ ↠ G′ are skipped. The p-morphism checks go through the shared
+    oracle, so isomorphic pairs are decided only once across calls.
+
+    Input:
+        minimize: if True, compare the bisimulation quotients of the
+        subframes first. A p-morphism F′ ↠ G′ is a bisimulation, so F′ and G′
+        then have isomorphic quotients, and pairs with different quotients
+        are skipped without a search. (Log(F′) itself is not the logic of
+        the quotient of F′, e.g. an irreflexive 2-cycle has a reflexive
+        point as quotient, so the search is still done on F′ and G′.)
+'''
+def log_subset(F, G, minimize=False):
+    subframes_F = generated_subframes(F, minimize)
+    subframes_G = generated_subframes(G, minimize)
+    subframes_F.sort(key=lambda entry: entry[2][:2])
 
     # Exercise 1.10
     # Let F be a pretransitive frame, G a finite point-generated frame.
     # Log(F) ⊆ Log(G ) iff F′ ↠ G for some point-generated subframe F′ of F.
-    for sub_G in subframes_G:
+    witnesses = []
+    for sub_G, form_G, profile_G, quotient_G in subframes_G:
         foundFPrime = False
-        for sub_F in subframes_F:
-            f = check_p_morphism(sub_F, sub_G)
+        order = witnesses + [i for i in range(len(subframes_F)) if i not in witnesses]
+        for i in order:
+            sub_F, form_F, profile_F, quotient_F = subframes_F[i]
+            if not profile_allows(profile_F, profile_G) or quotient_F != quotient_G:
+                continue
+            f = oracle.check(sub_F, sub_G, form_F, form_G)
             if f is not None:
                 foundFPrime = True
+                if i in witnesses:
+                    witnesses.remove(i)
+                witnesses.insert(0, i)
                 break
         
         if foundFPrime == False:
@@ -283,8 +482,8 @@ def printLogEqual(F,G, result):
     Exercise 2.14
     Given two finite frames F and G, decide if Log(F) = Log(G). 
 '''
-def log_equal(F, G):
-    return log_subset(F, G) and log_subset(G, F)
+def log_equal(F, G, minimize=False):
+    return log_subset(F, G, minimize) and log_subset(G, F, minimize)
 
 
 
@@ -293,16 +492,17 @@ def log_equal(F, G):
 
 '''
     Generate a random frame of specified size c
+    (see framegen for seeded, vectorized and structured random frames)
 '''
 def generate_random_frame(c):
     points = set(range(c)) #  {0, 1, ..., n-1}
     relation = set() 
     max_relations = c * (c - 1) // 2  # Max number of relations
 
-    for _ in range(random.randint(1, max_relations)): # number of relations to add
-        x = random.choice(tuple(points)) 
-        y = random.choice(tuple(points)) 
-        relation.add((x, y)) # add (x,y) to relation set
+    # draw all endpoints at once instead of one random.choice per endpoint
+    count = random.randint(1, max_relations) # number of relations to add
+    ends = random.choices(tuple(points), k=2 * count)
+    relation.update(zip(ends[::2], ends[1::2])) # add (x,y) to relation set
     
     return Frame(points, relation)
 
@@ -0,0 +1,129 @@
+'''
+    Parallel p-morphism search over several processes.
+
+    The search tree of pmsearch.explore is cut after a few choices into
+    independent subproblems, given by the list of choices leading to them.
+    Each worker process builds the search problem once and then replays and
+    searches the subproblems it is given; idle workers take the next
+    subproblem from the shared queue of the executor.
+
+    Subproblems are numbered in the order of the sequential search. As soon
+    as a p-morphism is found in subproblem i, the workers stop searching all
+    subproblems after i, while those before i are finished, so the result is
+    always the first p-morphism of the sequential search.
+'''
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pmsearch import iter_propagated, split_search
+
+
+# aim for this many subproblems per worker when the split depth is not given
+SUBPROBLEMS_PER_WORKER = 8
+
+# largest split depth tried when the split depth is not given
+MAX_SPLIT_DEPTH = 6
+
+# state of a worker process, set by init_worker
+worker_problem = None
+worker_symmetry = None
+worker_first = None
+
+
+'''
+    Sets up a worker process
+
+    Input:
+        problem: SearchProblem to search
+        first: shared integer, the index of the first subproblem known to
+        have a p-morphism
+'''
+def init_worker(problem, first):
+    global worker_problem, worker_symmetry, worker_first
+    worker_problem = problem
+    worker_symmetry = problem.automorphisms()
+    worker_first = first
+
+
+'''
+    Searches subproblem i of the worker's problem
+
+    Output:
+        (i, images) where images are the image indices of the first
+        p-morphism of the subproblem, or None if it has none or was cancelled
+'''
+def solve_subproblem(i, prefix):
+    cancelled = lambda: worker_first.value < i
+    if cancelled():
+        return i, None
+    for images in iter_propagated(worker_problem, prefix, cancelled, worker_symmetry):
+        return i, images
+    return i, None
+
+
+'''
+    Splits the problem into subproblems at the given depth, or at the
+    smallest depth giving enough subproblems for the workers
+'''
+def split_problem(problem, workers, depth=None):
+    if depth is not None:
+        return split_search(problem, depth)
+    prefixes = split_search(problem, 1)
+    for depth in range(2, MAX_SPLIT_DEPTH + 1):
+        if len(prefixes) >= SUBPROBLEMS_PER_WORKER * workers:
+            break
+        deeper = split_search(problem, depth)
+        if len(deeper) == len(prefixes):
+            break
+        prefixes = deeper
+    return prefixes
+
+
+'''
+    Finds the first p-morphism of a search problem with several processes
+
+    Input:
+        problem: SearchProblem
+        workers: number of worker processes (None for one per CPU)
+        split_depth: number of choices made by every subproblem (None to
+        choose it from the number of workers)
+
+    Output:
+        the image indices of the same p-morphism as the first one yielded by
+        pmsearch.iter_propagated(problem), or None if there is none
+'''
+def parallel_search(problem, workers=None, split_depth=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    prefixes = split_problem(problem, workers, split_depth)
+    if not prefixes:
+        return None
+
+    context = multiprocessing.get_context()
+    first = context.RawValue('q', len(prefixes))
+    solutions = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(prefixes)), mp_context=context,
+                             initializer=init_worker, initargs=(problem, first)) as executor:
+        pending = {executor.submit(solve_subproblem, i, prefix) for i, prefix in enumerate(prefixes)}
+        unfinished = set(range(len(prefixes)))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled():
+                    continue
+                i, images = future.result()
+                unfinished.discard(i)
+                if images is not None:
+                    solutions[i] = images
+                    first.value = min(first.value, i)
+
+            # stop once every subproblem before the first solution is done
+            if solutions and all(i > first.value for i in unfinished):
+                for future in pending:
+                    future.cancel()
+                break
+
+    if not solutions:
+        return None
+    return solutions[min(solutions)]
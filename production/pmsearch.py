@@ -0,0 +1,631 @@
+'''
+    Backtracking search for p-morphisms between finite frames.
+
+    Points of F and G are replaced by their indices 0, 1, ..., and the
+    successors and predecessors of every point are stored once as integer
+    bitmasks. A partial map is a list images, where images[i] is the index in
+    G of the image of the i-th point of F. Then
+
+        forward condition:  f[R(x)] ⊆ S(f(x)) and f[R^-1(x)] ⊆ S^-1(f(x))
+        back condition:     f[R(x)] ⊇ S(f(x))
+
+    become subset tests on bitmasks, where f[A] is the image of a mask A.
+
+    Before the search, invariants preserved by p-morphisms restrict the
+    possible images of every point of F.
+'''
+from adjacency import csr_arrays
+from canonical import Automorphisms
+from reachability import strongly_connected_components
+
+
+# height of points from which a cycle is reachable
+INFINITE_HEIGHT = float('inf')
+
+# number of branches between two polls of the cancellation function
+CHECK_INTERVAL = 256
+
+
+'''
+    Yields the positions of the bits set in mask, from the lowest
+'''
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+'''
+    Number of bits set in mask
+'''
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+'''
+    Returns the bitmask of the images of the points in mask
+'''
+def image(mask, images):
+    result = 0
+    for i in bits(mask):
+        result |= 1 << images[i]
+    return result
+
+
+'''
+    Returns the successor and predecessor bitmasks of every point of a frame
+
+    Input:
+        points: array of worlds
+        R: set of (x,y) pairs representing relation from x to y
+    Output:
+        I. array where bit j of entry i is set iff points[i] R points[j]
+        II. array where bit j of entry i is set iff points[j] R points[i]
+'''
+def neighbour_masks(points, R):
+    index = {x: i for i, x in enumerate(points)}
+    succ = [0] * len(points)
+    pred = [0] * len(points)
+    for (x, y) in R:
+        i, j = index[x], index[y]
+        succ[i] |= 1 << j
+        pred[j] |= 1 << i
+    return succ, pred
+
+
+'''
+    Computes invariants of the points of a frame that p-morphisms preserve
+
+    Input:
+        succ: successor bitmasks of the points of the frame
+    Output:
+        dictionary of arrays, one entry per point:
+            reflexive: x R x
+            cyclic: x lies on a cycle (a cluster of the frame)
+            outdegree: number of successors
+            height: length of the longest path starting at x, 
+            or INFINITE_HEIGHT if a cycle is reachable from x
+'''
+def point_invariants(succ):
+    n = len(succ)
+    src = [i for i in range(n) for j in bits(succ[i])]
+    dst = [j for i in range(n) for j in bits(succ[i])]
+    indptr, indices = csr_arrays(n, src, dst)
+    component, num_components = strongly_connected_components(n, indptr, indices)
+    component = component.tolist()
+
+    sizes = [0] * num_components
+    for c in component:
+        sizes[c] += 1
+    reflexive = [bool(succ[i] >> i & 1) for i in range(n)]
+    cyclic = [reflexive[i] or sizes[component[i]] > 1 for i in range(n)]
+
+    # components are numbered sinks first
+    members = [[] for c in range(num_components)]
+    for i in range(n):
+        members[component[i]].append(i)
+    component_height = [0] * num_components
+    for c in range(num_components):
+        if cyclic[members[c][0]]:
+            component_height[c] = INFINITE_HEIGHT
+            continue
+        x = members[c][0]
+        for y in bits(succ[x]):
+            component_height[c] = max(component_height[c], component_height[component[y]] + 1)
+
+    return {
+        'reflexive': reflexive,
+        'cyclic': cyclic,
+        'outdegree': [popcount(mask) for mask in succ],
+        'height': [component_height[component[i]] for i in range(n)],
+    }
+
+
+'''
+    Computes the possible images of every point of F
+
+    A p-morphism f maps
+        reflexive points to reflexive points,
+        points on a cycle to points on a cycle,
+        every point x to a point with the same height (paths from x are 
+        mapped to paths from f(x) by the forward condition, and paths from 
+        f(x) are lifted to paths from x by the back condition),
+        every point x onto a point with at most as many successors, since
+        R(x) is mapped onto S(f(x)).
+
+    Output:
+        array of bitmasks, where bit a of entry x is set iff f(x) = a is
+        allowed by the invariants
+'''
+def invariant_domains(succ_F, succ_G):
+    inv_F = point_invariants(succ_F)
+    inv_G = point_invariants(succ_G)
+    domains = []
+    for x in range(len(succ_F)):
+        domain = 0
+        for a in range(len(succ_G)):
+            if inv_F['reflexive'][x] and not inv_G['reflexive'][a]:
+                continue
+            if inv_F['cyclic'][x] and not inv_G['cyclic'][a]:
+                continue
+            if inv_F['height'][x] != inv_G['height'][a]:
+                continue
+            if inv_G['outdegree'][a] > inv_F['outdegree'][x]:
+                continue
+            domain |= 1 << a
+        domains.append(domain)
+    return domains
+
+
+'''
+    Defines a p-morphism search problem F ->-> G
+
+    Input:
+        F, G: frames containing an array of worlds and set of ordered pair relations
+
+    Output: Creates a SearchProblem object holding the points of both frames
+    in a fixed order and their successor and predecessor bitmasks
+
+'''
+class SearchProblem:
+    def __init__(self, F, G):
+        self.points_F = list(F.points)
+        self.points_G = list(G.points)
+        self.n = len(self.points_F)
+        self.m = len(self.points_G)
+        self.succ_F, self.pred_F = neighbour_masks(self.points_F, F.relation)
+        self.succ_G, self.pred_G = neighbour_masks(self.points_G, G.relation)
+        self.all_G = (1 << self.m) - 1
+        self.domains = invariant_domains(self.succ_F, self.succ_G)
+        self.candidates = [list(bits(domain)) for domain in self.domains]
+
+    def __repr__(self):
+        return f"SearchProblem(|F|={self.n}, |G|={self.m})"
+
+    '''
+        Returns False if the invariants already rule out every p-morphism:
+        some point of F has no possible image, or some point of G is not
+        a possible image of any point
+    '''
+    def feasible(self):
+        if self.n < self.m:
+            return False
+        covered = 0
+        for domain in self.domains:
+            if domain == 0:
+                return False
+            covered |= domain
+        return covered == self.all_G
+
+    '''
+        Returns the automorphisms of G, whose orbits are used to skip
+        choices symmetric to choices that already failed
+    '''
+    def automorphisms(self):
+        succ = [list(bits(mask)) for mask in self.succ_G]
+        pred = [list(bits(mask)) for mask in self.pred_G]
+        return Automorphisms(succ, pred)
+
+    '''
+        Returns the mapping given by images as a dictionary from points of F
+        to points of G
+    '''
+    def mapping(self, images):
+        points_G = self.points_G
+        return {x: points_G[a] for x, a in zip(self.points_F, images)}
+
+    '''
+        Checks whether the partial map, where the points in assigned have
+        images, can still be extended to a p-morphism after mapping point k
+        to a
+    '''
+    def consistent(self, images, assigned, k, a):
+        succ_F, pred_F = self.succ_F, self.pred_F
+        succ_G = self.succ_G
+
+        # forward condition for the edges between k and assigned points
+        if image(succ_F[k] & assigned, images) & ~succ_G[a]:
+            return False
+        if image(pred_F[k] & assigned, images) & ~self.pred_G[a]:
+            return False
+
+        # surjective: enough unassigned points left for the uncovered ones
+        uncovered = self.all_G & ~image(assigned, images)
+        if popcount(uncovered) > self.n - popcount(assigned):
+            return False
+
+        # back condition for k and the assigned points whose successors
+        # now include k: every successor of f(x) not yet covered by f[R(x)]
+        # needs its own unassigned successor of x
+        for x in bits((pred_F[k] & assigned) | (1 << k)):
+            missing = succ_G[images[x]] & ~image(succ_F[x] & assigned, images)
+            if popcount(missing) > popcount(succ_F[x] & ~assigned):
+                return False
+
+        return True
+
+
+'''
+    Yields every p-morphism of a search problem, as a tuple of image indices.
+
+    The points of F are assigned in order, trying their possible images in
+    the order of G, with an explicit stack instead of recursion.
+'''
+def iter_assignments(problem):
+    if not problem.feasible():
+        return
+    n = problem.n
+    candidates = problem.candidates
+    images = [-1] * n
+    candidate = [0] * n
+    assigned = 0
+    k = 0
+
+    while k >= 0:
+        if k == n:
+            yield tuple(images)
+            k -= 1
+            continue
+
+        # undo the previous image tried for k
+        if images[k] != -1:
+            assigned ^= 1 << k
+            images[k] = -1
+
+        if candidate[k] == len(candidates[k]):
+            # all images tried, backtrack
+            candidate[k] = 0
+            k -= 1
+            continue
+
+        a = candidates[k][candidate[k]]
+        candidate[k] += 1
+        images[k] = a
+        assigned |= 1 << k
+        if problem.consistent(images, assigned, k, a):
+            k += 1
+
+
+'''
+    Defines the state of a propagating p-morphism search
+
+    Input:
+        problem: SearchProblem
+
+    Output: Creates a Propagator object. domains[x] is the bitmask of the
+    points of G that x can still be mapped to. Every change of a domain is
+    recorded on the trail, so the search can undo all changes made after a
+    given point by calling undo(len(trail) at that point).
+
+'''
+class Propagator:
+    def __init__(self, problem):
+        self.problem = problem
+        self.domains = list(problem.domains)
+        self.trail = []
+        self.queue = []
+        self.queued = [False] * problem.n
+        # degree of every point of F, to break ties between domains of equal size
+        self.degree = [popcount(s | p) for s, p in zip(problem.succ_F, problem.pred_F)]
+        self.successors = [list(bits(mask)) for mask in problem.succ_F]
+        self.predecessors = [list(bits(mask)) for mask in problem.pred_F]
+        # points whose back condition depends on the domain of x
+        self.dependents = [list(bits(mask | 1 << x)) for x, mask in enumerate(problem.pred_F)]
+        self.succ_union = {}
+        self.pred_union = {}
+        # cover -> images a of G with S(a) ⊆ cover
+        self.back_allowed = {}
+
+    '''
+        Restricts the domain of x to mask, returns False if it becomes empty
+    '''
+    def restrict(self, x, mask):
+        old = self.domains[x]
+        new = old & mask
+        if new == old:
+            return True
+        if new == 0:
+            return False
+        self.trail.append((x, old))
+        self.domains[x] = new
+        if not self.queued[x]:
+            self.queued[x] = True
+            self.queue.append(x)
+        return True
+
+    '''
+        Undoes all domain changes made after the trail had the given length
+    '''
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            x, old = trail.pop()
+            self.domains[x] = old
+        for x in self.queue:
+            self.queued[x] = False
+        self.queue.clear()
+
+    '''
+        Union of the successors (or predecessors) in G of the points in mask
+    '''
+    def union(self, mask, neighbours, cache):
+        if mask not in cache:
+            result = 0
+            for a in bits(mask):
+                result |= neighbours[a]
+            cache[mask] = result
+        return cache[mask]
+
+    '''
+        Maps x to a and propagates, returns False if some domain becomes empty
+    '''
+    def assign(self, x, a):
+        return self.restrict(x, 1 << a) and self.propagate()
+
+    '''
+        Propagates the constraints until no domain changes
+
+        forward condition: for every edge x R y, arc consistency of
+            D(y) ⊆ S[D(x)] and D(x) ⊆ S^-1[D(y)]
+        back condition: f(z) = a needs S(a) ⊆ D(R(z)), and if a successor b
+            of the only image a of z is allowed for just one successor y of z,
+            then f(y) = b
+        surjectivity: every point b of G is in some domain, and if it is in
+            just one domain D(x), then f(x) = b
+    '''
+    def propagate(self, changed=()):
+        succ_G, pred_G = self.problem.succ_G, self.problem.pred_G
+        domains = self.domains
+        for x in changed:
+            if not self.queued[x]:
+                self.queued[x] = True
+                self.queue.append(x)
+
+        while True:
+            while self.queue:
+                x = self.queue.pop()
+                self.queued[x] = False
+
+                # arc revisions along the edges of F at x
+                reachable = self.union(domains[x], succ_G, self.succ_union)
+                for y in self.successors[x]:
+                    if not self.restrict(y, reachable):
+                        return False
+                reaching = self.union(domains[x], pred_G, self.pred_union)
+                for y in self.predecessors[x]:
+                    if not self.restrict(y, reaching):
+                        return False
+
+                # back condition at x and at the predecessors of x, whose
+                # successors' domains just changed
+                for z in self.dependents[x]:
+                    if not self.revise_back(z):
+                        return False
+
+            if not self.revise_surjective():
+                return False
+            if not self.queue:
+                return True
+
+    '''
+        Back condition at z as a counting constraint over the successors of z
+    '''
+    def revise_back(self, z):
+        domains = self.domains
+        successors = self.successors[z]
+        cover = 0
+        for y in successors:
+            cover |= domains[y]
+
+        if cover not in self.back_allowed:
+            succ_G = self.problem.succ_G
+            allowed = 0
+            for a in range(self.problem.m):
+                if succ_G[a] & ~cover == 0:
+                    allowed |= 1 << a
+            self.back_allowed[cover] = allowed
+        if not self.restrict(z, self.back_allowed[cover]):
+            return False
+
+        # f(z) is known: every successor of f(z) needs a successor of z
+        domain = domains[z]
+        if domain & (domain - 1) == 0:
+            needed = self.problem.succ_G[domain.bit_length() - 1]
+            return self.revise_cover(needed, successors)
+        return True
+
+    '''
+        Surjectivity as a counting constraint over all points of F
+    '''
+    def revise_surjective(self):
+        return self.revise_cover(self.problem.all_G, range(self.problem.n))
+
+    '''
+        Checks that every point in needed is in the domain of some point in
+        points, and maps a point to b if it is the only one that can be mapped
+        to b. Returns False if some point in needed cannot be covered.
+
+        Pigeonhole: the points of needed that are not yet the image of a
+        point with a single image each need their own point with a larger
+        domain; if there are just as many of those, all of them must be
+        mapped into needed.
+    '''
+    def revise_cover(self, needed, points):
+        domains = self.domains
+        once = twice = 0
+        fixed = 0
+        free = []
+        for y in points:
+            domain = domains[y]
+            twice |= once & domain
+            once |= domain
+            if domain & (domain - 1) == 0:
+                fixed |= domain
+            else:
+                free.append(y)
+        if needed & ~once:
+            return False
+        open_needed = needed & ~fixed
+        count = popcount(open_needed)
+        if count > len(free):
+            return False
+        if count == len(free):
+            for y in free:
+                if not self.restrict(y, open_needed):
+                    return False
+        for b in bits(needed & ~twice):
+            for y in points:
+                if domains[y] >> b & 1:
+                    if not self.restrict(y, 1 << b):
+                        return False
+                    break
+        return True
+
+    '''
+        Chooses the next point of F to branch on: the smallest domain with more
+        than one image, ties broken by the largest degree. Returns None if
+        every domain has a single image.
+    '''
+    def select(self):
+        best = None
+        best_key = None
+        for x, domain in enumerate(self.domains):
+            size = popcount(domain)
+            if size > 1:
+                key = (size, -self.degree[x])
+                if best_key is None or key < best_key:
+                    best, best_key = x, key
+        return best
+
+    '''
+        Returns the image indices when every domain has a single image
+    '''
+    def images(self):
+        return tuple(domain.bit_length() - 1 for domain in self.domains)
+
+
+'''
+    Depth-first search with constraint propagation over a search problem.
+
+    After every choice f(x) = a the domains are propagated to a fixed point;
+    the next point to branch on is chosen by the MRV/degree heuristic, and
+    all domain changes are undone from the trail on backtrack. The search is
+    deterministic, so the same choices always lead to the same domains.
+
+    Input:
+        problem: SearchProblem
+        prefix: list of (x, a) choices made before the search starts
+        depth: if given, do not branch below this many choices; yield the
+        choices leading to every open branch instead
+        cancelled: if given, a function polled every CHECK_INTERVAL branches;
+        the search stops as soon as it returns True
+        symmetry: if given, the Automorphisms of G. When the choice f(x) = a
+        led to no p-morphism, f(x) = b is skipped for every b in the orbit
+        of a under the automorphisms fixing all images chosen before x,
+        since σ∘f maps one branch onto the other. Branches with
+        p-morphisms are never skipped, so all of them are still yielded.
+
+    Output:
+        generator of (choices, images) pairs, in the order of the search.
+        images is the tuple of image indices of a p-morphism, or None for an
+        open branch at the given depth; choices is the list of (x, a)
+        choices after the prefix, built only when depth is given.
+'''
+def explore(problem, prefix=(), depth=None, cancelled=None, symmetry=None):
+    if not problem.feasible():
+        return
+    state = Propagator(problem)
+    if not state.propagate(range(problem.n)):
+        return
+    for x, a in prefix:
+        if not state.assign(x, a):
+            return
+
+    x = state.select()
+    if x is None:
+        yield [], state.images()
+        return
+    if depth == 0:
+        yield [], None
+        return
+
+    # each entry: point branched on, its images to try, next image, trail
+    # mark, images that led to no p-morphism, and results before the last try
+    stack = [[x, list(bits(state.domains[x])), 0, len(state.trail), [], 0]]
+    branches = 0
+    results = 0
+    while stack:
+        entry = stack[-1]
+        x, values, i, mark, failed, before = entry
+        state.undo(mark)
+        if symmetry is not None and i > 0:
+            if results == before:
+                failed.append(values[i - 1])
+            if failed:
+                orbit = symmetry.orbits(fixed_images(prefix, stack))
+                skipped = {orbit[a] for a in failed}
+                while i < len(values) and orbit[values[i]] in skipped:
+                    i += 1
+        if i == len(values):
+            stack.pop()
+            continue
+        entry[2] = i + 1
+        entry[5] = results
+
+        branches += 1
+        if cancelled is not None and branches % CHECK_INTERVAL == 0 and cancelled():
+            return
+        if not state.assign(x, values[i]):
+            continue
+        y = state.select()
+        if y is None:
+            # all constraints hold once every domain is a single image
+            choices = choices_of(stack) if depth is not None else None
+            results += 1
+            yield choices, state.images()
+            continue
+        if len(stack) == depth:
+            results += 1
+            yield choices_of(stack), None
+            continue
+        stack.append([y, list(bits(state.domains[y])), 0, len(state.trail), [], 0])
+
+
+'''
+    Returns the choices (x, a) made along the search stack
+'''
+def choices_of(stack):
+    return [(entry[0], entry[1][entry[2] - 1]) for entry in stack]
+
+
+'''
+    Returns the images chosen in the prefix and below the top of the stack
+'''
+def fixed_images(prefix, stack):
+    return [a for x, a in prefix] + [entry[1][entry[2] - 1] for entry in stack[:-1]]
+
+
+'''
+    Yields every p-morphism of a search problem, as a tuple of image indices,
+    using constraint propagation (see explore)
+'''
+def iter_propagated(problem, prefix=(), cancelled=None, symmetry=None):
+    for choices, images in explore(problem, prefix, cancelled=cancelled, symmetry=symmetry):
+        yield images
+
+
+'''
+    Splits the search tree of a problem into independent subproblems
+
+    Input:
+        problem: SearchProblem
+        depth: number of choices made by every subproblem
+
+    Output:
+        list of prefixes, each a list of (x, a) choices. Searching them in
+        order with iter_propagated(problem, prefix) yields the same
+        p-morphisms, in the same order, as iter_propagated(problem).
+'''
+def split_search(problem, depth):
+    return [choices for choices, images in explore(problem, depth=depth)]
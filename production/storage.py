@@ -0,0 +1,18 @@
+'''
+    Locations of the files written by the program
+'''
+import os
+
+
+# directory in the home directory holding all output and cache files
+OUTPUT_DIRECTORY = "finiteStructures_output"
+
+
+'''
+    Gets data output path
+'''
+def get_data_file_path(filename):
+    home_dir = os.path.expanduser("~")
+    output_dir = os.path.join(home_dir, OUTPUT_DIRECTORY)
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, filename)
@@ -0,0 +1,162 @@
+'''
+    Union-find (disjoint sets) over Xn = {0, 1, ..., n-1}, backed by NumPy arrays.
+
+    Edges can come from any iterable or generator, for example a file being
+    read line by line. They are consumed in chunks, and every chunk is merged
+    with vectorized union by rank and path compression, so the memory used is
+    O(n) plus one chunk of edges, and no adjacency lists are ever built.
+'''
+from itertools import islice
+
+import numpy as np
+
+
+# number of edges read from an iterable and merged at once
+CHUNK_SIZE = 1 << 16
+
+
+'''
+    Defines a union-find structure
+
+    Input:
+        n: number of points, the sets partition Xn = {0, 1, ..., n-1}
+
+    Output: Creates a UnionFind object where every point is its own set
+
+'''
+class UnionFind:
+    def __init__(self, n):
+        self.n = n
+        self.parent = np.arange(n, dtype=np.int64)
+        self.rank = np.zeros(n, dtype=np.int8)
+
+    def __repr__(self):
+        return f"UnionFind(n={self.n})"
+
+    '''
+        Returns the representative of the set containing x
+    '''
+    def find(self, x):
+        return int(self.find_all(np.array([x]))[0])
+
+    '''
+        Returns the representatives of the sets containing the points xs,
+        and points every x in xs directly to its representative
+    '''
+    def find_all(self, xs):
+        parent = self.parent
+        roots = parent[xs]
+        while True:
+            grandparents = parent[roots]
+            if np.array_equal(grandparents, roots):
+                break
+            roots = grandparents
+        parent[xs] = roots
+        return roots
+
+    '''
+        Merges the sets containing x and y
+    '''
+    def union(self, x, y):
+        self.union_pairs(np.array([x]), np.array([y]))
+
+    '''
+        Merges the sets containing a[k] and b[k] for every k
+
+        In every round, the root of lower rank is hooked under the root of
+        higher rank (ties: the larger index under the smaller one). A root
+        hooked by several pairs keeps one parent; the other pairs are
+        merged in the next round.
+    '''
+    def union_pairs(self, a, b):
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        parent = self.parent
+        rank = self.rank
+        while len(a) > 0:
+            ra = self.find_all(a)
+            rb = self.find_all(b)
+            different = ra != rb
+            a, b, ra, rb = a[different], b[different], ra[different], rb[different]
+            if len(a) == 0:
+                break
+
+            a_above = (rank[ra] > rank[rb]) | ((rank[ra] == rank[rb]) & (ra < rb))
+            child = np.where(a_above, rb, ra)
+            root = np.where(a_above, ra, rb)
+            parent[child] = root
+
+            hooked = parent[child] == root
+            tie = hooked & (rank[child] == rank[root])
+            np.maximum.at(rank, root[tie], rank[child[tie]] + 1)
+
+    '''
+        Merges the endpoints of every (x,y) pair of an iterable of edges
+    '''
+    def union_edges(self, edges, chunk_size=CHUNK_SIZE):
+        if isinstance(edges, np.ndarray):
+            edges = edges.reshape(-1, 2)
+            for start in range(0, len(edges), chunk_size):
+                self.union_pairs(edges[start:start + chunk_size, 0], edges[start:start + chunk_size, 1])
+            return
+
+        edges = iter(edges)
+        while True:
+            chunk = np.array(list(islice(edges, chunk_size)), dtype=np.int64).reshape(-1, 2)
+            if len(chunk) == 0:
+                break
+            self.union_pairs(chunk[:, 0], chunk[:, 1])
+
+    '''
+        Returns an array labelling every point with its set.
+        Sets are numbered 0, 1, ... in the order of their smallest point.
+    '''
+    def labels(self):
+        roots = self.find_all(np.arange(self.n))
+        unique_roots, first, inverse = np.unique(roots, return_index=True, return_inverse=True)
+        rename = np.empty(len(unique_roots), dtype=np.int64)
+        rename[np.argsort(first, kind='stable')] = np.arange(len(unique_roots))
+        return rename[inverse]
+
+
+'''
+    Groups points by label
+
+    Input:
+        labels: array labelling every point 0, 1, ..., k-1
+    Output:
+        array of k sets, where set i contains the points labelled i
+'''
+def group_labels(labels):
+    order = np.argsort(labels, kind='stable')
+    bounds = np.zeros(labels.max() + 2 if len(labels) > 0 else 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels), out=bounds[1:])
+    return [set(order[bounds[i]:bounds[i + 1]].tolist()) for i in range(len(bounds) - 1)]
+
+
+'''
+    Input: positive integer n; an iterable of (x,y) pairs on Xn
+        as_sets: if True, group the labels into sets
+    Output: the connected components of (Xn, R U R^-1), as an array labelling
+    every point with its component, or as an array of sets
+'''
+def connected_components(n, edges, as_sets=False):
+    components = UnionFind(n)
+    components.union_edges(edges)
+    labels = components.labels()
+    if as_sets:
+        return group_labels(labels)
+    return labels
+
+
+'''
+    Reads edges from a text file with one "x y" pair per line.
+    Empty lines and lines starting with # are skipped.
+'''
+def read_edges(path):
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                x, y = line.split()[:2]
+                yield int(x), int(y)